@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+"""
+A benchmark that measures how long Caysen takes to start from cold, so that
+start up does not regress as subsystems are added.
+
+Each sample launches a fresh interpreter that imports and initializes a
+headless kernel (using "--startup-profile") and then exits.  The median of
+the samples is compared against a stored baseline and the benchmark fails if
+it is slower by more than the allowed tolerance, or if there is no baseline
+to compare against.  Baselines depend on the machine, so one must be stored
+with "--update" before the benchmark is first run on a new machine.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+_BASELINE = os.path.join(os.path.dirname(__file__), "startup.json")
+
+
+def measure(samples, command):
+    """
+    Runs the specified command the specified number of times in fresh
+    processes and times each run.
+
+    :param samples: The number of times to run the command.
+    :param command: The command to run, as a list of arguments.
+    :return: A list of wall times in seconds.
+    :raise CalledProcessError: If the command fails.
+    """
+    times = []
+    for _ in range(samples):
+        start_time = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start_time)
+    return times
+
+
+def main(argv=None):
+    """
+    The benchmark entry point.
+
+    :param argv: The command line arguments, or None to use sys.argv.
+    :return: An exit code.
+    """
+    parser = argparse.ArgumentParser(
+        description="Measures the cold start time of a headless kernel.")
+    parser.add_argument("--samples", type=int, default=10,
+                        help="the number of processes to launch")
+    parser.add_argument("--baseline", default=_BASELINE,
+                        help="the JSON file containing the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="the fraction by which the median may exceed "
+                             "the baseline")
+    parser.add_argument("--update", action="store_true",
+                        help="store the measured median as the new baseline")
+    args = parser.parse_args(argv)
+
+    command = [sys.executable, "-m", "caysen.main", "--startup-profile",
+               "--headless"]
+    times = measure(args.samples, command)
+    median = statistics.median(times)
+    print("Cold start: median %.1f ms, min %.1f ms, max %.1f ms over %d runs."
+          % (median * 1000.0, min(times) * 1000.0, max(times) * 1000.0,
+             len(times)))
+
+    if args.update:
+        with open(args.baseline, "w") as file:
+            json.dump({"median": median}, file, indent=2)
+        print("Stored the new baseline in %s." % args.baseline)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("There is no baseline to compare against; run with --update "
+              "to store one.")
+        return 1
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)["median"]
+    limit = baseline * (1.0 + args.tolerance)
+    if median > limit:
+        print("Regression: the median exceeds the baseline of %.1f ms by "
+              "more than %d%%." % (baseline * 1000.0, args.tolerance * 100))
+        return 1
+    print("Within %d%% of the baseline of %.1f ms." %
+          (args.tolerance * 100, baseline * 1000.0))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
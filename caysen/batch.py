@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+
+"""
+A batch driver for Caysen that runs many independent, headless village
+simulations across a pool of processes and collects their metrics.
+
+Every simulation is identified by the index of its parameter set and its
+seed.  Results are appended to a file of JSON lines as soon as each run
+finishes, so an interrupted batch may simply be started again with the same
+arguments and only the runs that are missing or that failed will be
+executed.  Once the batch is finished, a summary of every run in the results
+file is printed and written alongside it.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import statistics
+import sys
+
+from caysen.config import create_kernel, get_combined_params
+from caysen.kernel import SubSystemError, AppExitSignal
+
+
+def _get_run_id(param_index, seed):
+    """
+    Creates the unique identifier of a single run.
+
+    :param param_index: The index of the run's parameter set.
+    :param seed: The run's random seed.
+    :return: The run identifier.
+    """
+    return "%d-%d" % (param_index, seed)
+
+
+def load_results(path):
+    """
+    Reads all of the results that have already been written to the specified
+    results file.
+
+    Incomplete lines, such as one left behind by an interrupted batch, are
+    ignored so that the corresponding run is executed again.  A run that
+    was executed more than once, such as one that failed and was retried,
+    is represented by its latest result.
+
+    :param path: The path of the results file.
+    :return: A list of run results.
+    """
+    results = dict()
+    if not os.path.exists(path):
+        return []
+
+    with open(path) as file:
+        for line in file:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            if "run" in result:
+                results[result["run"]] = result
+    return list(results.values())
+
+
+def create_jobs(param_sets, seeds, duration, factory=create_kernel,
+                completed=()):
+    """
+    Creates a job for every combination of parameter set and seed that has
+    not yet been completed.
+
+    :param param_sets: A list of parameter dictionaries.
+    :param seeds: The seeds to run each parameter set with.
+    :param duration: The amount of simulated time in seconds for each run.
+    :param factory: A module-level function that creates a kernel and
+    accepts a "headless" keyword argument, such as "create_kernel".
+    :param completed: The identifiers of runs to skip.
+    :return: A list of jobs.
+    """
+    jobs = []
+    for param_index, params in enumerate(param_sets):
+        for seed in seeds:
+            run_id = _get_run_id(param_index, seed)
+            if run_id not in completed:
+                jobs.append((run_id, seed, params, duration, factory))
+    return jobs
+
+
+def run_simulation(job):
+    """
+    Creates, runs, and shuts down a single headless kernel.
+
+    This is executed in a worker process and so must only return plain,
+    picklable data.  Any error, whether while creating, running, or shutting
+    down the kernel, is recorded in the result rather than raised, so that
+    one failed run does not abort the rest of the batch.
+
+    :param job: A tuple of the run identifier, seed, parameters, duration
+    in simulated seconds, and kernel factory.
+    :return: A dictionary of metrics for the run.
+    """
+    run_id, seed, params, duration, factory = job
+    params = {**params, "headless": True, "kernel.seed": seed}
+    result = {"run": run_id, "seed": seed, "params": params,
+              "status": "completed"}
+
+    kernel = None
+    try:
+        kernel = factory(headless=True)
+        kernel.initialize(params)
+        stats = kernel.run_for(duration)
+        result.update(frames=stats["frames"], ticks=stats["ticks"],
+                      elapsed=stats["elapsed"], simulated=stats["simulated"],
+                      subsystems=stats["subsystems"])
+    except AppExitSignal:
+        result["status"] = "exited"
+    except Exception as error:
+        _record_error(result, error)
+
+    if kernel is not None:
+        try:
+            if not kernel.shutdown() and result["status"] != "error":
+                result["status"] = "error"
+                result["error"] = "The shutdown process did not complete " \
+                                  "without error."
+        except Exception as error:
+            if result["status"] != "error":
+                _record_error(result, error)
+    return result
+
+
+def _record_error(result, error):
+    """
+    Marks the specified run result as having failed with the specified error.
+
+    :param result: The run result to modify.
+    :param error: The exception the run failed with.
+    """
+    result["status"] = "error"
+    result["error"] = str(error) if isinstance(error, SubSystemError) else \
+        "%s: %s" % (type(error).__name__, error)
+
+
+def run_batch(jobs, output, processes=None):
+    """
+    Distributes the specified jobs across a pool of processes and appends
+    each result to the specified file as soon as it is available.
+
+    :param jobs: The jobs to run, as created by "create_jobs".
+    :param output: The path of the results file.
+    :param processes: The number of worker processes, or None to use one per
+    core.
+    :return: A list of the results of this batch.
+    """
+    results = []
+    with multiprocessing.Pool(processes) as pool, open(output, "a") as file:
+        for result in pool.imap_unordered(run_simulation, jobs):
+            file.write(json.dumps(result) + "\n")
+            file.flush()
+            results.append(result)
+            logging.info("Finished run %s (%d of %d): %s." %
+                         (result["run"], len(results), len(jobs),
+                          result["status"]))
+    return results
+
+
+def summarize(results):
+    """
+    Aggregates the metrics of the specified results.
+
+    :param results: A list of run results.
+    :return: A dictionary of aggregate metrics.
+    """
+    completed = [result for result in results
+                 if result["status"] == "completed"]
+    summary = {"runs": len(results), "completed": len(completed)}
+    if completed:
+        summary["mean_elapsed"] = statistics.fmean(
+            result["elapsed"] for result in completed)
+        summary["ticks_per_second"] = \
+            sum(result["ticks"] for result in completed) / \
+            sum(result["elapsed"] for result in completed)
+    return summary
+
+
+def _get_summary_path(output):
+    """
+    Creates the path of the summary written alongside the specified results
+    file.
+
+    :param output: The path of the results file.
+    :return: The path of the summary file.
+    """
+    return "%s.summary.json" % os.path.splitext(output)[0]
+
+
+def main(argv=None):
+    """
+    The batch entry point.
+
+    :param argv: The command line arguments, or None to use sys.argv.
+    :return: An exit code.
+    """
+    parser = argparse.ArgumentParser(
+        description="Runs many headless Caysen simulations in parallel.")
+    parser.add_argument("--runs", type=int, default=100,
+                        help="the number of seeds to run per parameter set")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="the first seed to use")
+    parser.add_argument("--duration", type=float, default=600.0,
+                        help="the simulated seconds per run")
+    parser.add_argument("--tick-rate", type=int, default=20,
+                        help="the simulation ticks per second, unless "
+                             "overridden by a parameter set")
+    parser.add_argument("--params", default=None,
+                        help="a JSON file containing a list of parameter "
+                             "sets to run")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="the number of worker processes")
+    parser.add_argument("--output", default="results.jsonl",
+                        help="the results file to append to")
+    parser.add_argument("--summary", default=None,
+                        help="the file to write the summary of all runs to, "
+                             "by default beside the results file")
+    parser.add_argument("--log-level", default="INFO",
+                        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="the minimum level of messages to log")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s",
+                        level=args.log_level)
+
+    base_params = get_combined_params('data/config.yml')
+    param_sets = [{}]
+    if args.params is not None:
+        with open(args.params) as file:
+            param_sets = json.load(file)
+    param_sets = [{"kernel.tickRate": args.tick_rate, **base_params, **params}
+                  for params in param_sets]
+
+    seeds = range(args.seed, args.seed + args.runs)
+    # Failed runs are not considered done, so that resuming retries them.
+    completed = set(result["run"] for result in load_results(args.output)
+                    if result["status"] != "error")
+    jobs = create_jobs(param_sets, seeds, args.duration, create_kernel,
+                       completed)
+
+    logging.info("Running %d simulations (%d already completed)." %
+                 (len(jobs), len(completed)))
+    run_batch(jobs, args.output, args.processes)
+
+    results = load_results(args.output)
+    summary = summarize(results)
+    summary["errors"] = sum(1 for result in results
+                            if result["status"] == "error")
+    summary_path = args.summary or _get_summary_path(args.output)
+    with open(summary_path, "w") as file:
+        json.dump(summary, file, indent=2)
+        file.write("\n")
+    print(json.dumps(summary, indent=2))
+    logging.info("Wrote the batch summary to %s." % summary_path)
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,45 @@
 """
+Contains functions for assembling kernels and gathering the parameters used
+to initialize them.
 
+Subsystem modules are only imported by the kernels that need them, and their
+backends (TDL, NumPy, and so on) are only imported once the subsystems are
+initialized, so that importing this module remains cheap.
 """
-from caysen.game.state import GameSubSystem
 from caysen.kernel import Kernel
 
-from caysen.subsystem.audio import AudioSubSystem
-from caysen.subsystem.display import DisplaySubSystem
-from caysen.subsystem.input import InputSubSystem
 
+def create_kernel(headless=False, replay=False):
+    """
+    Creates a kernel with all of the subsystems needed to run Caysen.
+
+    A headless kernel renders to an in-memory canvas instead of a window and
+    has neither audio nor input, so that simulations may run as fast as
+    possible on machines without a display.  A replay kernel is a headless
+    kernel whose input is read from a recorded session.
+
+    :param headless: Whether or not to create a headless kernel.
+    :param replay: Whether or not to create a kernel for replaying sessions.
+    :return: A new kernel.
+    """
+    from caysen.game.state import GameSubSystem
 
-def create_kernel():
     kernel = Kernel()
 
+    if headless or replay:
+        from caysen.subsystem.headless import HeadlessDisplaySubSystem
+        from caysen.subsystem.input import InputSubSystem
+
+        kernel.add(HeadlessDisplaySubSystem())
+        kernel.add(GameSubSystem())
+        if replay:
+            kernel.add(InputSubSystem())
+        return kernel
+
+    from caysen.subsystem.audio import AudioSubSystem
+    from caysen.subsystem.display import DisplaySubSystem
+    from caysen.subsystem.input import InputSubSystem
+
     kernel.add(AudioSubSystem())
     kernel.add(DisplaySubSystem())
     kernel.add(GameSubSystem())
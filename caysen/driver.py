@@ -0,0 +1,321 @@
+"""
+Contains an alternative to the kernel's own loop that executes it within an
+asyncio event loop.
+"""
+import asyncio
+import inspect
+import logging
+import time
+from functools import partial
+
+from caysen.kernel import AppExitSignal, SubSystemError
+
+
+def _split(tiers, method):
+    """
+    Splits every tier of the specified execution plan into the subsystems
+    whose specified method is an ordinary function and those whose method is
+    a coroutine.
+
+    :param tiers: The execution tiers to split.
+    :param method: The name of the method that will be executed.
+    :return: A list of pairs of lists of subsystems, one pair per tier.
+    """
+    split = []
+    for tier in tiers:
+        coroutines = [subsystem for subsystem in tier
+                      if inspect.iscoroutinefunction(
+                          getattr(subsystem, method))]
+        functions = [subsystem for subsystem in tier
+                     if subsystem not in coroutines]
+        split.append((functions, coroutines))
+    return split
+
+
+async def _gather(coroutines):
+    """
+    Runs the specified coroutines concurrently and waits for all of them to
+    finish.
+
+    As with the kernel, should more than one of them raise an exception,
+    errors take precedence over exit requests.
+
+    :param coroutines: The coroutines to run.
+    """
+    if len(coroutines) == 1:
+        await coroutines[0]
+        return
+
+    results = await asyncio.gather(*coroutines, return_exceptions=True)
+    errors = [result for result in results
+              if isinstance(result, BaseException)]
+    if errors:
+        raise next((error for error in errors
+                    if not isinstance(error, AppExitSignal)), errors[0])
+
+
+class AsyncKernelDriver:
+    """
+    Represents a mechanism for executing a kernel inside an asyncio event
+    loop instead of with its own, blocking loop.
+
+    Subsystems driven this way may implement any of "initialize", "update",
+    and "shutdown" as coroutines, which are awaited in dependency order
+    exactly where the kernel would otherwise have called them; those within
+    the same tier are awaited concurrently.  Since their updates interleave,
+    coroutines updated concurrently are traced, and their allocations
+    tracked, as a single span named after all of them, although each is
+    still timed on its own.  Ordinary subsystems are executed by the kernel
+    as usual, including on its thread pool if it has one.
+
+    The driver yields to the event loop between every frame, sleeping until
+    the next one is due if the frame rate is limited, so that background
+    tasks (loading assets, saving games, streaming metrics, and so on) make
+    progress without threads and without stalling the frame loop, provided
+    they do not block.  Such tasks should be started with "spawn" so that
+    they are cancelled when the kernel is shutdown.
+
+    Attributes:
+        kernel (Kernel): The kernel being executed.
+        tasks (set): The background tasks that have been spawned and have not
+        yet finished.
+    """
+
+    def __init__(self, kernel):
+        self.kernel = kernel
+        self.tasks = set()
+
+        kernel.driver = self
+
+    async def initialize(self, params):
+        """
+        Initializes all of the subsystems in the kernel using the specified
+        dictionary of user-modified parameters, awaiting those whose
+        initialization is a coroutine.
+
+        :param params: A dictionary of user-modified parameters.
+        :raise SubSystemError: If a subsystem encountered a critical error
+        during initialization.
+        :raise ValueError: If the kernel is already running.
+        """
+        kernel = self.kernel
+        kernel._configure(params)
+
+        start_time = time.perf_counter()
+        initialize = partial(kernel._initialize_subsystem, params=params)
+        for functions, coroutines in _split(kernel.get_plan('init'),
+                                            "initialize"):
+            if functions:
+                kernel._execute(functions, initialize)
+            if coroutines:
+                await _gather([self._initialize_subsystem(subsystem, params)
+                               for subsystem in coroutines])
+        kernel._deliver()
+        logging.info("Initialized all subsystems in %.3f ms." %
+                     ((time.perf_counter() - start_time) * 1000.0))
+
+    async def main(self, params):
+        """
+        Initializes, runs, and shuts down the kernel, logging rather than
+        raising any error, in the same manner as the application's entry
+        point.
+
+        :param params: A dictionary of user-modified parameters.
+        :return: An exit code.
+        """
+        try:
+            await self.initialize(params)
+        except SubSystemError:
+            logging.exception("A subsystem encountered a critical error "
+                              "during initialization; the application will "
+                              "now exit prematurely.")
+            await self.shutdown()
+            return 0
+
+        try:
+            await self.run()
+        except AppExitSignal:
+            logging.info('Received user application exit signal from kernel; '
+                         'proceeding to shutdown.')
+        except SubSystemError:
+            logging.critical('A subsytem encountered a critical error during '
+                             'the main game loop; attempting to shutdown '
+                             'those that remain.')
+
+        if not await self.shutdown():
+            logging.critical("The shutdown process did not complete without "
+                             "error.  Please inspect above in the log file to "
+                             "find out why.")
+        return 0
+
+    async def run(self):
+        """
+        Executes the kernel's frame loop, exactly as "Kernel.run" does, but
+        yields to the event loop between frames instead of blocking.
+
+        :raise AppExitSignal: If a subsystem has received a user event that
+        signals the application should close.
+        :raise SubSystemError: If a subsystem encounters a critical error
+        while updating.
+        :raise ValueError: If the kernel is already running or there are no
+        subsystems available for use.
+        """
+        kernel = self.kernel
+        fixed, frame = kernel._begin()
+        fixed = _split(fixed, "update")
+        frame = _split(frame, "update")
+
+        kernel.limiter.start()
+        next_report = kernel.timer.current_time + kernel.stats_interval
+
+        try:
+            while kernel.is_running:
+                kernel.timer.update()
+                delta_time = kernel._next_delta_time(kernel.timer.delta_time)
+                if delta_time is None:
+                    logging.info("Finished replaying the session.")
+                    kernel.is_running = False
+                    break
+                await self._frame(fixed, frame, delta_time)
+                next_report = kernel._maintain(next_report)
+
+                if kernel.replay is None:
+                    await kernel.limiter.wait_async()
+                else:
+                    await asyncio.sleep(0)
+        finally:
+            kernel._end()
+            logging.info("Kernel averaged %.3f ms per frame with %.3f ms of "
+                         "jitter." % (kernel.limiter.frame_time * 1000.0,
+                                      kernel.limiter.jitter * 1000.0))
+
+    async def shutdown(self):
+        """
+        Cancels every background task and then shuts down all of the
+        subsystems in the kernel individually, awaiting those whose shutdown
+        is a coroutine.
+
+        :return: Whether or not the shutdown process completed without error.
+        """
+        for task in list(self.tasks):
+            task.cancel()
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+        kernel = self.kernel
+        failures = []
+        for subsystem in kernel.get_execution_order('shutdown'):
+            with kernel._shutting_down(subsystem, failures):
+                if inspect.iscoroutinefunction(subsystem.shutdown):
+                    await subsystem.shutdown()
+                else:
+                    subsystem.shutdown()
+        kernel._release()
+        return not failures
+
+    def spawn(self, coroutine, name=None):
+        """
+        Starts the specified coroutine as a background task on the event
+        loop.
+
+        Background tasks run whenever the frame loop yields and are cancelled
+        when the kernel is shutdown.  Any exception they raise is logged.
+
+        :param coroutine: The coroutine to run.
+        :param name: The name of the task, if any.
+        :return: The new task.
+        """
+        task = asyncio.get_running_loop().create_task(coroutine, name=name)
+        self.tasks.add(task)
+        task.add_done_callback(self._on_task_done)
+        return task
+
+    async def _frame(self, fixed, frame, delta_time):
+        """
+        Executes a single frame, exactly as "Kernel._frame" does.
+
+        :param fixed: The split tiers of fixed step subsystems.
+        :param frame: The split tiers of subsystems to update once per frame.
+        :param delta_time: The amount of time in seconds since the previous
+        frame.
+        :raise AppExitSignal: If a subsystem signals the application should
+        close.
+        :raise SubSystemError: If a subsystem encounters a critical error.
+        """
+        kernel = self.kernel
+        start_time = kernel._begin_frame()
+        if fixed:
+            for step in kernel._steps(delta_time):
+                await self._update(fixed, step)
+            kernel._interpolate(subsystems for pair in frame
+                                for subsystems in pair)
+        await self._update(frame, delta_time)
+        kernel._end_frame(start_time)
+
+    async def _initialize_subsystem(self, subsystem, params):
+        """
+        Awaits the initialization of the specified subsystem.
+
+        :param subsystem: The subsystem to initialize.
+        :param params: A dictionary of user-modified parameters.
+        :raise SubSystemError: If the subsystem encountered a critical error
+        during initialization.
+        """
+        with self.kernel._initializing(subsystem):
+            await subsystem.initialize(params, self.kernel)
+
+    def _on_task_done(self, task):
+        """
+        Forgets the specified background task and logs its exception, if any.
+
+        :param task: The task that finished.
+        """
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.error("The background task %s failed." % task.get_name(),
+                          exc_info=task.exception())
+
+    async def _update(self, tiers, delta_time):
+        """
+        Updates each of the specified split tiers of subsystems, in order,
+        with the specified delta time.
+
+        :param tiers: The split tiers of subsystems to update.
+        :param delta_time: The amount of time in seconds to update with.
+        :raise AppExitSignal: If a subsystem signals the application should
+        close.
+        :raise SubSystemError: If a subsystem encounters a critical error.
+        """
+        kernel = self.kernel
+        update = partial(kernel._update_subsystem, delta_time=delta_time)
+        for functions, coroutines in tiers:
+            if functions:
+                kernel._execute(functions, update)
+            if len(coroutines) == 1:
+                await self._update_subsystem(coroutines[0], delta_time)
+            elif coroutines:
+                # Concurrent updates interleave on this thread, so they are
+                # traced, and their allocations tracked, as a single span.
+                name = "+".join(subsystem.name for subsystem in coroutines)
+                with kernel._instrumenting(name):
+                    await _gather([self._update_subsystem(subsystem,
+                                                          delta_time, False)
+                                   for subsystem in coroutines])
+
+    async def _update_subsystem(self, subsystem, delta_time, instrument=True):
+        """
+        Awaits the update of the specified subsystem, subject to its update
+        rate.
+
+        :param subsystem: The subsystem to update.
+        :param delta_time: The amount of time in seconds to update with.
+        :param instrument: Whether or not the update is traced and its
+        allocations tracked on its own.
+        :raise AppExitSignal: If the subsystem signals the application should
+        close.
+        :raise SubSystemError: If the subsystem encounters a critical error.
+        """
+        delta_time = self.kernel._schedule(subsystem, delta_time)
+        if delta_time is not None:
+            with self.kernel._updating(subsystem, instrument):
+                await subsystem.update(delta_time)
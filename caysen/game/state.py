@@ -3,7 +3,9 @@
 """
 from abc import ABCMeta, abstractmethod
 
+from caysen.game.world import World
 from caysen.kernel import SubSystem, SubSystemError
+from caysen.util import memory
 
 
 class GameState(metaclass=ABCMeta):
@@ -247,40 +249,71 @@ class GameStateStack:
         since the previous update.
         """
         for state in reversed(self.stack):
-            if not state.update(delta_time):
+            with memory.track(state.name, "state"):
+                modal = state.update(delta_time)
+            if not modal:
                 break
 
 
 class GameSubSystem(SubSystem):
     """
-
+    The simulation state is kept in a double-buffered world whose buffers
+    are swapped at the end of every tick, so that other subsystems (and jobs)
+    may read the previous tick's state from "world.front" while the game
+    states write the next one into "world.back".  Since a frame may run
+    several ticks but its jobs are only joined at its end, a buffer that is
+    swapped out is only reused once the frame has ended; the number of each
+    tick is published to the "world" channel, whose delivery at the end of
+    the frame releases them.
+
+    The game states are drawn by the display, once per frame, rather than
+    after every tick, so that fast-forwarding does not draw states that are
+    never presented.  The game hands the display its renderer through the
+    "renderers" channel rather than by reaching into the display itself.
 
     Attributes:
-        canvas (Canvas):
         stack (GameStateStack):
+        ticks (Channel): The channel the number of each tick is published
+        to.
+        world (World): The double-buffered simulation state.
     """
 
     def __init__(self):
         super().__init__("game")
-        self.canvas = None
         self.stack = GameStateStack()
+        self.ticks = None
+        self.world = World(defer=True)
 
     def get_dependencies(self):
         return {"init": ["display"], "update": [], "shutdown": []}
 
     def initialize(self, params, kernel):
-        if not kernel.subsystems["display"]:
-            raise SubSystemError("Could not obtain a canvas; the display "
+        try:
+            renderers = kernel.events.channel("renderers")
+        except KeyError as error:
+            raise SubSystemError("Could not register a renderer; the display "
                                  "subsystem has not been initialized or is "
-                                 "not present.")
-        self.canvas = kernel.subsystems["display"].canvas
+                                 "not present.") from error
+        renderers.publish(self.stack.draw)
+
+        self.ticks = kernel.events.channel("world", ("tick",))
+        kernel.events.subscribe("world", self.name, self._on_ticks)
 
     def shutdown(self):
-        self.canvas = None
         self.stack.dispose()
 
     def update(self, delta_time):
         self.stack.update(delta_time)
-        self.stack.draw(self.canvas)
+        self.world.swap()
+        self.ticks.publish(self.world.front.tick)
         if not self.stack:
             pass
+
+    def _on_ticks(self, channel):
+        """
+        Releases the world buffers swapped out during the frame that just
+        ended, whose jobs have all been joined.
+
+        :param channel: The channel the tick numbers were delivered on.
+        """
+        self.world.release()
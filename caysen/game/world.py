@@ -0,0 +1,155 @@
+"""
+Contains a double-buffered, array-backed store for the simulation state so
+that other subsystems may read the world while the simulation writes it.
+"""
+from caysen.util import backends
+
+
+
+
+class WorldBuffer:
+    """
+    Represents a single, complete copy of the simulation state as a
+    collection of named arrays.
+
+    Attributes:
+        arrays (dict): The array of each field associated by name.
+        tick (int): The number of the tick this buffer holds the state of.
+    """
+
+    def __init__(self):
+        self.arrays = dict()
+        self.tick = 0
+
+    def __contains__(self, name):
+        return name in self.arrays
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def _set_writeable(self, writeable):
+        """
+        Allows or forbids writing to every array in this buffer.
+
+        :param writeable: Whether or not the arrays may be written to.
+        """
+        for array in self.arrays.values():
+            array.flags.writeable = writeable
+
+
+class World:
+    """
+    Represents the simulation state as a front buffer, which holds the state
+    as of the most recently completed tick, and a back buffer, which the
+    simulation writes the next tick into.
+
+    Readers, such as the display or AI jobs, should take a reference to the
+    front buffer once and read every field through it; because the buffers
+    are swapped by replacing that single reference, the reader sees a
+    consistent snapshot without locks or copies, even while the simulation
+    writes the back buffer on another thread.  The arrays of the front
+    buffer are read-only so that accidental writes fail loudly.
+
+    By default, readers must finish with a snapshot before the end of the
+    following tick, at which point its buffer is reused.  If reuse is
+    deferred, buffers that are swapped out are instead retired until
+    "release" is called, such as once every job of a frame that may run
+    several ticks has been joined, and new ones are allocated in the
+    meantime as needed.
+
+    By default, the back buffer starts each tick as a copy of the front one
+    so that the simulation may update the state in place.
+
+    Attributes:
+        back (WorldBuffer): The state being written for the next tick.
+        carry (bool): Whether or not the front buffer is copied into the back
+        one after each swap.
+        defer (bool): Whether or not buffers that are swapped out are only
+        reused once released.
+        front (WorldBuffer): The state as of the most recently completed tick.
+        retired (list): The buffers swapped out since the last release.
+        spares (list): The released buffers that may be reused.
+    """
+
+    def __init__(self, carry=True, defer=False):
+        self.back = WorldBuffer()
+        self.carry = carry
+        self.defer = defer
+        self.front = WorldBuffer()
+        self.retired = []
+        self.spares = []
+
+    def add(self, name, shape, dtype=float, fill=0):
+        """
+        Adds a field with the specified name to both buffers.
+
+        :param name: The unique name of the field.
+        :param shape: The shape of the field's array.
+        :param dtype: The type of each element.
+        :param fill: The initial value of each element.
+        :return: The field's array in the back buffer.
+        :raise ValueError: If a field with the same name already exists.
+        """
+        if name in self.back:
+            raise ValueError("The world already has a field named %s." % name)
+
+        backends.import_numpy()
+        self.back.arrays[name] = backends.np.full(shape, fill, dtype=dtype)
+        self.front.arrays[name] = backends.np.full(shape, fill, dtype=dtype)
+        self.front.arrays[name].flags.writeable = False
+        for buffer in self.retired + self.spares:
+            buffer.arrays[name] = backends.np.full(shape, fill, dtype=dtype)
+        return self.back.arrays[name]
+
+    def remove(self, name):
+        """
+        Removes the field with the specified name from both buffers.
+
+        :param name: The name of the field.
+        """
+        for buffer in [self.back, self.front] + self.retired + self.spares:
+            buffer.arrays.pop(name, None)
+
+    def release(self):
+        """
+        Allows the buffers that have been swapped out since the last release
+        to be reused, once nothing can still be reading them.
+        """
+        self.spares.extend(self.retired)
+        self.retired.clear()
+
+    def swap(self):
+        """
+        Publishes the back buffer as the new front buffer and begins writing
+        the next tick into the old front one or, if reuse is deferred, into a
+        released or newly allocated buffer.
+        """
+        published = self.back
+        published.tick = self.front.tick + 1
+        published._set_writeable(False)
+
+        if not self.defer:
+            self.back = self.front
+        else:
+            self.retired.append(self.front)
+            self.back = self.spares.pop() if self.spares else \
+                self._allocate(published)
+        self.front = published
+
+        self.back._set_writeable(True)
+        if self.carry:
+            for name, array in self.back.arrays.items():
+                backends.np.copyto(array, published.arrays[name])
+
+    def _allocate(self, template):
+        """
+        Creates a new buffer whose fields have the same shapes and types as
+        those of the specified buffer.
+
+        :param template: The buffer to match.
+        :return: The new buffer.
+        """
+        buffer = WorldBuffer()
+        for name, array in template.arrays.items():
+            buffer.arrays[name] = backends.np.empty_like(array)
+        return buffer
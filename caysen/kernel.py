@@ -3,10 +3,30 @@ Contains all major subsystems (audio, input, and video) as well as a simple
 kernel to manage them.
 """
 import logging
+import math
+import random
+import signal
+import threading
+import time
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
+from functools import partial
 
 
-from caysen.util.timers import SystemTimer
+from caysen.util import memory, tracing
+from caysen.util.collector import FrameCollector
+from caysen.util.events import EventBus
+from caysen.util.jobs import JobError, JobSystem
+from caysen.util.profiler import SamplingProfiler
+from caysen.util.replay import SessionRecorder, SessionReplay, seed_all
+from caysen.util.stats import FrameStats
+from caysen.util.timers import FrameLimiter, SystemTimer
+from caysen.util.watchdog import Watchdog
+
+# The code flag of functions defined with "async def"; it is tested directly
+# rather than through the inspect module, which is slow to import.
+_CO_COROUTINE = 0x80
 
 
 class AppExitSignal(Exception):
@@ -25,17 +45,35 @@ class SubSystemError(Exception):
     pass
 
 
+class DependencyError(SubSystemError):
+    """
+    Represents an exception that is thrown when the dependencies between
+    subsystems cannot be resolved, such as when they form a cycle.
+    """
+    pass
+
+
 class SubSystem(metaclass=ABCMeta):
     """
     Represents a simple mechanism for creating and managing re-usable system
     resources and executing common tasks.
 
     Attributes:
+        fixed_step (bool): Whether or not this subsystem is updated at the
+        kernel's fixed tick rate (if one is set) as opposed to once per frame.
+        main_thread (bool): Whether or not this subsystem must always be
+        executed on the kernel's own thread, even when the kernel is executing
+        in parallel; this is necessary for windowing and event libraries.
         name (str): The name of the subsystem for identification purposes.
+        update_rate (float): The number of times per second this subsystem
+        should be updated, or zero to update it on every pass of the kernel.
     """
 
     def __init__(self, name):
+        self.fixed_step = True
+        self.main_thread = False
         self.name = name
+        self.update_rate = 0
 
     @abstractmethod
     def get_dependencies(self):
@@ -69,6 +107,21 @@ class SubSystem(metaclass=ABCMeta):
         """
         pass
 
+    def interpolate(self, alpha):
+        """
+        Informs this subsystem how far the simulation has progressed towards
+        the next fixed tick so that it may blend between the previous and
+        current simulation states.
+
+        This is only called by kernels running at a fixed tick rate and only
+        for subsystems that are updated once per frame.  By default this does
+        nothing.
+
+        :param alpha: The fraction, between zero and one, of a fixed tick that
+        has elapsed since the last simulation update.
+        """
+        pass
+
     @abstractmethod
     def shutdown(self):
         """
@@ -102,23 +155,29 @@ def _get_dependencies(for_state, subsystems):
     specific state.
 
     :param for_state: The state to extract the dependencies for.
+    :param subsystems: A dictionary of subsystems, each associated with a
+    unique name.
     :return: A dictionary of dependencies for a specific state,
     each associated with a subsystem by name.
     """
     deps = dict()
 
-    for subsystem in subsystems.values():
-        deps[subsystem.name] = subsystem.get_dependencies()[for_state]
+    for name, subsystem in subsystems.items():
+        deps[name] = subsystem.get_dependencies()[for_state]
     return deps
 
 
-def _get_execution_order(for_state, subsystems):
+def _get_execution_tiers(for_state, subsystems):
     """
     Resolves the specified dictionary of subsystems with associated
-    dependencies into a flat list based on which state is needed,
+    dependencies into a list of tiers based on which state is needed,
     organized from those with the least dependencies to those with the most
     in order to ensure all subsystems execute before their dependants.
 
+    Subsystems within a single tier do not depend on one another and may
+    therefore be executed in any order (or even at the same time), so long as
+    every tier is completed before the next one begins.
+
     For this project, the possible states to choose dependencies from are:
         * init - Initialization dependencies dictate the order that
         subsystems are initialized in.
@@ -127,44 +186,86 @@ def _get_execution_order(for_state, subsystems):
         * shutdown - Shutdown dependencies dictate the order that subsystems
         are shutdown.
 
-    This algorithm is taken from a StackOverflow question at the following
-    link:
-    https://stackoverflow.com/questions/5287516/dependencies-tree-implementation
-    and the link to the original script in Python is:
-        https://code.activestate.com/recipes/576570-dependency-resolver/
+    This is an implementation of Kahn's algorithm and so runs in time linear
+    in the number of subsystems and dependencies.  Dependencies that are not
+    named in the dictionary of subsystems are considered to be satisfied.
 
     :param for_state: A single string that denotes which state the
     dependencies should be taken from.
     :param subsystems: A dictionary of subsystems, each associated with a
     unique name that appears in the dependency list.
-    :return:
+    :return: A list of tiers, each of which is a list of subsystems.
+    :raise DependencyError: If the dependencies contain a cycle.
     """
-    tree = []
-    deps = dict((k, set(v)) for k, v in
-                _get_dependencies(for_state, subsystems).items())
+    deps = _get_dependencies(for_state, subsystems)
+    dependants = dict((name, []) for name in deps)
+    in_degree = dict.fromkeys(deps, 0)
 
-    while deps:
-        # Dependencies that are not named in the original dict.
-        # This does not actually happen in this project but it is still
-        # an important case to cover.
-        no_deps = set(subsystem for dep in deps.values() \
-                      for subsystem in deps) - set(deps.keys())
+    for name, required in deps.items():
+        for dep in set(required):
+            if dep in dependants:
+                dependants[dep].append(name)
+                in_degree[name] += 1
 
-        # Named dependants with no associated dependencies.
-        no_deps.update(subsystem for subsystem, dep in deps.items()
-                       if not dep)
+    tiers = []
+    tier = [name for name, count in in_degree.items() if count == 0]
+    resolved = 0
 
-        # Because they have no further dependencies, they can be added
-        # to the resulting dependency tree.
-        tree.append(no_deps)
+    while tier:
+        tiers.append([subsystems[name] for name in tier])
+        resolved += len(tier)
 
-        # Remove dependencies that have been met (are in the tree).
-        deps = dict(((subsystem, dep - no_deps)
-                     for subsystem, dep in deps.items() if dep))
+        next_tier = []
+        for name in tier:
+            for dependant in dependants[name]:
+                in_degree[dependant] -= 1
+                if in_degree[dependant] == 0:
+                    next_tier.append(dependant)
+        tier = next_tier
 
-    # Flatten and revert to subsystems instead of strings.
-    flat_tree = [item for subtree in tree for item in subtree]
-    return [subsystems[system] for system in flat_tree]
+    if resolved != len(deps):
+        cycle = [name for name, count in in_degree.items() if count > 0]
+        raise DependencyError("The %s dependencies of the following "
+                              "subsystems cannot be resolved because they "
+                              "contain or depend on a cycle: %s." %
+                              (for_state, ", ".join(cycle)))
+    return tiers
+
+
+def _has_coroutines(subsystem):
+    """
+    Determines whether or not any of the initialize, update, or shutdown
+    methods of the specified subsystem are coroutines.
+
+    :param subsystem: The subsystem to check.
+    :return: True if the subsystem must be executed by an asynchronous
+    driver, otherwise False.
+    """
+    return any(getattr(method, "__code__", None) is not None and
+               method.__code__.co_flags & _CO_COROUTINE
+               for method in (subsystem.initialize, subsystem.update,
+                              subsystem.shutdown))
+
+
+def _select_tiers(tiers, fixed_step):
+    """
+    Creates and returns a copy of the specified execution tiers that only
+    contains subsystems whose fixed step flag matches the one given.
+
+    Because removing subsystems from a tier never introduces a dependency
+    between the remaining ones, the result is still a valid execution plan.
+
+    :param tiers: The execution tiers to filter.
+    :param fixed_step: Whether to select fixed step or per-frame subsystems.
+    :return: A list of non-empty tiers.
+    """
+    selected = []
+    for tier in tiers:
+        tier = [subsystem for subsystem in tier
+                if subsystem.fixed_step == fixed_step]
+        if tier:
+            selected.append(tier)
+    return selected
 
 
 class Kernel:
@@ -173,19 +274,203 @@ class Kernel:
     themselves manage various system resources, in a simple and centralized
     manner.
 
+    The kernel may optionally run at a fixed tick rate.  In this mode,
+    subsystems that are marked as fixed step (typically the simulation) are
+    updated with a constant delta time as many times as the elapsed frame
+    time allows, up to a maximum number of catch-up steps per frame.  The
+    remaining subsystems (typically display and input) are updated once per
+    frame and are told how far along the next tick the simulation is so that
+    they may interpolate.
+
+    Fixed ticks may also be fast-forwarded by setting the time scale, either
+    with "kernel.timeScale" or at runtime, e.g. by cycling through the scales
+    listed in "kernel.timeScales" (1x, 4x, 16x, and unlimited by default).
+    The number of ticks per second actually achieved is measured once per
+    second and kept in "simulation_rate".
+
+    The kernel may also optionally execute subsystems in parallel.  In this
+    mode, every subsystem within a single tier of an execution plan is
+    updated concurrently on a thread pool, and the kernel waits for the
+    entire tier to finish before beginning the next one.  Subsystems that
+    share a tier must therefore not modify one another's state without
+    synchronization.
+
+    Finally, each subsystem may be updated at its own rate.  The kernel
+    accumulates the elapsed time for every subsystem with an update rate and
+    skips its updates until enough time has passed, at which point the
+    subsystem is updated with all of the time that has elapsed since its
+    previous update.  Update rates may be overridden by name using the
+    "<name>.updateRate" parameter.
+
+    Subsystems may communicate through the kernel's event bus instead of
+    calling one another directly.  Messages published during a frame are
+    delivered at the end of that frame, in the order subsystems are updated;
+    those published during initialization are delivered once every subsystem
+    has been initialized.
+
+    Every subsystem update is timed and the durations, along with the time
+    spent working on each frame as a whole (recorded as "kernel"), are kept
+    in the kernel's statistics.  A summary of these may be logged
+    periodically by setting the "kernel.statsInterval" parameter.  Each
+    subsystem may also be given a budget of time per frame, in seconds, with
+    the "<name>.budget" parameter; the kernel's watchdog then logs subsystems
+    that exceed their budget and asks them to degrade under sustained
+    overload.
+
+    Setting "kernel.gcControl" disables Python's automatic garbage collection
+    while the kernel is running.  Collections are instead made between
+    frames, using whatever time is left over before the next frame, and
+    their pauses are recorded in the kernel's statistics as "gc".
+
+    Setting the "kernel.trace" parameter to a file path enables tracing,
+    in which every frame and every subsystem initialization, update, and
+    shutdown is recorded in the Trace Event Format.  The kernel's tracer is
+    also made active so that game states may record their own spans.
+
+    Subsystems may also split their own work into many small jobs through
+    the kernel's job system, whose workers persist for the kernel's lifetime.
+    Every job submitted during a frame is finished by the end of that frame,
+    and a job that fails stops the kernel as a subsystem error would.  The
+    number of workers may be set with "kernel.jobWorkers".
+
+    Subsystems may implement their methods as coroutines, in which case the
+    kernel must be executed by an AsyncKernelDriver rather than by "run",
+    which also lets background tasks run on the same event loop between
+    frames.
+
+    Setting "kernel.memory" to a file path enables allocation tracking, in
+    which tracemalloc is used to attribute the memory allocated by every
+    subsystem update, and by every game state, on one frame out of every
+    "kernel.memoryInterval" (60 by default); on one of those frames out of
+    every "kernel.memorySnapshotInterval" (10 by default), allocations are
+    also attributed to source lines, which takes far longer.  A report of the
+    allocations attributed to each, and of the difference between the
+    allocations at shutdown and at startup, is written to the path on
+    shutdown.
+
+    The kernel's sampling profiler may be started and stopped at any time
+    with "toggle_profiler", or by sending the process SIGUSR1 if
+    "kernel.profileSignal" is set.  Each run samples the stack of every
+    thread every "kernel.profileInterval" seconds (five milliseconds by
+    default) for "kernel.profileFrames" frames (600 by default) and writes
+    them as collapsed stacks to a numbered file named after "kernel.profile"
+    ("profile.folded" by default).
+
+    Sessions may be recorded by setting "kernel.record" to a file path, in
+    which case every frame's delta time, the input events consumed during it,
+    and the random seed are written to a compact binary log.  Setting
+    "kernel.replay" to the path of such a log instead feeds those back into
+    the kernel as fast as possible, without pacing frames, until the log is
+    exhausted.  A specific seed may also be given with "kernel.seed".
+
     Attributes:
+        accumulator (float): The amount of time in seconds that has elapsed
+        but not yet been consumed by fixed ticks.
+        allocations (AllocationTracker): Attributes memory allocations to
+        subsystems, or None if allocations are not tracked.
+        alpha (float): The fraction of a fixed tick left in the accumulator
+        after the most recent frame.
+        collector (FrameCollector): Collects garbage between frames, or None
+        if garbage is collected automatically.
+        driver (AsyncKernelDriver): The driver executing this kernel inside
+        an event loop, or None if it executes its own loop.
+        events (EventBus): The channels through which subsystems exchange
+        messages.
+        executor (ThreadPoolExecutor): The thread pool used to execute tiers
+        of subsystems in parallel, or None if executing serially.
+        init_times (dict): The time in seconds each subsystem took to
+        initialize associated by name.
         is_running (bool): Whether or not the kernel is currently executing
         an infinite loop that only stops when signaled.
+        jobs (JobSystem): The pool of workers that subsystems may split their
+        work across.
+        limiter (FrameLimiter): Paces the main loop so that it does not run
+        faster than necessary.
+        max_steps (int): The maximum number of fixed ticks that may be run in
+        a single frame before any remaining time is discarded; while the
+        frame limiter is idle this is raised to however many ticks an idle
+        frame lasts, so that the simulation does not slow down.
+        needs_reset (bool): Whether or not the per-run state must be reset
+        before the next frame, because the kernel has not run since it was
+        configured or since its subsystems changed.
+        plans (dict): A cache of execution plans, each a list of tiers of
+        subsystems, associated by state; this is cleared whenever a subsystem
+        is added or removed.
+        profile_handler (object): The SIGUSR1 handler that was replaced in
+        order to toggle the profiler, or None if none was replaced.
+        profile_requested (bool): Whether or not the profiler should be
+        toggled at the start of the next frame.
+        profiler (SamplingProfiler): Samples the stack of every thread while
+        it is running.
+        recorder (SessionRecorder): The log the current session is being
+        recorded to, or None if it is not being recorded.
+        replay (SessionReplay): The log the current session is being
+        replayed from, or None if it is not being replayed.
+        rate_start (tuple): The time and the number of ticks at the start of
+        the current measurement of the simulation rate.
+        schedules (dict): The time in seconds elapsed since the last update
+        and the time accumulated towards the next one, associated by
+        subsystem; entries are created when a subsystem is first scheduled
+        with an update rate and discarded once it no longer has one.
+        simulation_rate (float): The number of fixed ticks per second that
+        were achieved over the most recent second.
+        stats (FrameStats): Rolling timing statistics for each subsystem's
+        updates and for each frame.
+        stats_interval (float): The number of seconds between each logged
+        summary of the kernel statistics, or zero to never log them.
         subsystems (dict): A dictionary of subsystems, each associated with a
         unique name.
+        tick_rate (int): The number of fixed ticks per second, or zero to
+        update every subsystem once per frame with the elapsed time.
+        ticks (int): The number of fixed ticks executed since the kernel
+        started running.
+        time_scale (float): The multiple of real time at which fixed ticks
+        are executed, or zero to execute as many as possible.
+        time_scales (list): The time scales that "cycle_time_scale" steps
+        through, in order.
         timer (SystemTimer): A high performance timer that measured elapsed
         time in fractions of a second.
+        tracer (TraceWriter): The writer that records the frame timeline, or
+        None if tracing is disabled.
+        unlimited_budget (float): The amount of time in seconds per frame
+        that may be spent on fixed ticks when the time scale is unlimited.
+        watchdog (Watchdog): Monitors subsystems against their frame budgets.
     """
 
     def __init__(self):
+        self.accumulator = 0.0
+        self.allocations = None
+        self.alpha = 0.0
+        self.collector = None
+        self.driver = None
+        self.events = EventBus()
+        self.executor = None
+        self.init_times = dict()
         self.is_running = False
+        self.jobs = JobSystem()
+        self.limiter = FrameLimiter()
+        self.max_steps = 5
+        self.needs_reset = True
+        self.plans = dict()
+        self.profile_handler = None
+        self.profile_requested = False
+        self.profiler = SamplingProfiler("profile.folded")
+        self.recorder = None
+        self.rate_start = (0.0, 0)
+        self.replay = None
+        self.schedules = dict()
+        self.simulation_rate = 0.0
+        self.stats = FrameStats()
+        self.stats_interval = 0
         self.subsystems = dict()
+        self.tick_rate = 0
+        self.ticks = 0
+        self.time_scale = 1.0
+        self.time_scales = [1, 4, 16, 0]
         self.timer = SystemTimer()
+        self.tracer = None
+        self.unlimited_budget = 0.01
+        self.watchdog = Watchdog()
 
     def add(self, subsystem, name=None):
         """
@@ -203,29 +488,244 @@ class Kernel:
         if name is None:
             name = subsystem.name
         self.subsystems[name] = subsystem
+        self.plans.clear()
+        self.needs_reset = True
+
+    def cycle_time_scale(self):
+        """
+        Sets the time scale to the one that follows the current one in the
+        list of time scales, wrapping around at the end.
+
+        :return: The new time scale.
+        """
+        scales = self.time_scales
+        index = scales.index(self.time_scale) + 1 \
+            if self.time_scale in scales else 0
+        self.set_time_scale(scales[index % len(scales)])
+        return self.time_scale
+
+    def get_plan(self, for_state):
+        """
+        Returns the execution plan for the specified state, resolving and
+        caching it if necessary.
+
+        :param for_state: The state to obtain the plan for; one of "init",
+        "update", or "shutdown".
+        :return: A list of tiers, each of which is a list of subsystems that
+        do not depend on one another.
+        :raise DependencyError: If the dependencies contain a cycle.
+        """
+        if for_state not in self.plans:
+            self.plans[for_state] = _get_execution_tiers(for_state,
+                                                         self.subsystems)
+        return self.plans[for_state]
+
+    def get_execution_order(self, for_state):
+        """
+        Returns the execution plan for the specified state flattened into a
+        single list of subsystems.
+
+        :param for_state: The state to obtain the order for.
+        :return: A list of subsystems in execution order.
+        :raise DependencyError: If the dependencies contain a cycle.
+        """
+        return [subsystem for tier in self.get_plan(for_state)
+                for subsystem in tier]
 
     def initialize(self, params):
         """
         Initializes all of the subsystems in this kernel using the specified
         dictionary of user-modified parameters.
 
+        If the kernel is executing in parallel, then every subsystem within a
+        tier of the initialization plan is initialized concurrently.  The time
+        each subsystem took to initialize is written to the log.
+
         :param params: A dictionary of user-modified parameters.
         :raise SubSystemError: If a subsystem encountered a critical error
         during initialization.
-        :raise ValueError: If the kernel is already running.
+        :raise ValueError: If the kernel is already running, a subsystem has
+        coroutine methods, or a session is to be recorded or replayed while
+        executing in parallel.
+        """
+        for subsystem in self.subsystems.values():
+            if _has_coroutines(subsystem):
+                raise ValueError("The subsystem %s has coroutine methods and "
+                                 "must be executed by an asynchronous driver."
+                                 % subsystem.name)
+
+        self._configure(params)
+
+        start_time = time.perf_counter()
+        initialize = partial(self._initialize_subsystem, params=params)
+        for tier in self.get_plan('init'):
+            self._execute(tier, initialize)
+        self._deliver()
+        logging.info("Initialized all subsystems in %.3f ms." %
+                     ((time.perf_counter() - start_time) * 1000.0))
+
+    def _deliver(self):
+        """
+        Delivers the messages published since the previous delivery, such as
+        during initialization, to their subscribers in update order.
+        """
+        self.events.set_order(subsystem.name for subsystem
+                              in self.get_execution_order('update'))
+        self.events.dispatch()
+
+    def _configure(self, params):
+        """
+        Configures this kernel, but none of its subsystems, using the
+        specified dictionary of user-modified parameters.
+
+        :param params: A dictionary of user-modified parameters.
+        :raise ValueError: If the kernel is already running or a session is
+        to be recorded or replayed while executing in parallel.
         """
         if self.is_running:
             raise ValueError('Kernel is already running.')
 
-        exec_order = _get_execution_order('init', self.subsystems)
-        for subsystem in exec_order:
-            try:
-                subsystem.initialize(params, self)
-            except SubSystemError:
-                logging.critical("Caught subsystem initialization error from "
-                                 "<i>%s</i>; notifying the caller." %
-                                 subsystem.name)
-                raise
+        self.needs_reset = True
+        self.tick_rate = params.get("kernel.tickRate", 0)
+        self.max_steps = params.get("kernel.maxSteps", 5)
+        self.limiter.fps = params.get("kernel.fps", 0)
+        self.limiter.idle_fps = params.get("kernel.idleFps", 5)
+        self.stats_interval = params.get("kernel.statsInterval", 0)
+        self.time_scales = params.get("kernel.timeScales", self.time_scales)
+        self.unlimited_budget = params.get("kernel.unlimitedBudget",
+                                           self.unlimited_budget)
+        self.set_time_scale(params.get("kernel.timeScale", self.time_scale))
+
+        if self.tick_rate < 0:
+            raise ValueError('The tick rate must not be negative.')
+        if self.max_steps < 1:
+            raise ValueError('There must be at least one step per frame.')
+
+        self.watchdog.patience = params.get("kernel.watchdogPatience", 30)
+        self.watchdog.recovery = params.get("kernel.watchdogRecovery", 120)
+        self.watchdog.headroom = params.get("kernel.watchdogHeadroom", 0.75)
+
+        for name, subsystem in self.subsystems.items():
+            subsystem.update_rate = params.get("%s.updateRate" % name,
+                                               subsystem.update_rate)
+            if "%s.budget" % name in params:
+                self.watchdog.set_budget(subsystem.name,
+                                         params["%s.budget" % name])
+
+        self._open_session(params)
+
+        if params.get("kernel.gcControl", False) and self.collector is None:
+            self.collector = FrameCollector(self.stats)
+
+        memory_path = params.get("kernel.memory", None)
+        if memory_path is not None and self.allocations is None:
+            self.allocations = memory.AllocationTracker(
+                memory_path, params.get("kernel.memoryInterval", 60),
+                params.get("kernel.memorySnapshotInterval", 10),
+                params.get("kernel.memoryDepth", 1))
+            self.allocations.start()
+            memory.set_tracker(self.allocations)
+
+        trace_path = params.get("kernel.trace", None)
+        if trace_path is not None and self.tracer is None:
+            self.tracer = tracing.TraceWriter(trace_path)
+            tracing.set_tracer(self.tracer)
+
+        self.profiler.path = params.get("kernel.profile", self.profiler.path)
+        self.profiler.interval = params.get("kernel.profileInterval",
+                                            self.profiler.interval)
+        self.profiler.length = params.get("kernel.profileFrames",
+                                          self.profiler.length)
+        if params.get("kernel.profileSignal", False) and \
+                self.profile_handler is None and hasattr(signal, "SIGUSR1") \
+                and threading.current_thread() is threading.main_thread():
+            self.profile_handler = signal.signal(signal.SIGUSR1,
+                                                 self._on_profile_signal)
+
+        workers = params.get("kernel.jobWorkers", None)
+        if workers is not None and workers != self.jobs.workers:
+            self.jobs.shutdown()
+            self.jobs = JobSystem(workers)
+
+        if params.get("kernel.parallel", False) and self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=params.get("kernel.workers", None),
+                thread_name_prefix="kernel")
+
+    def _open_session(self, params):
+        """
+        Opens the session log to record to or replay from, if any, and seeds
+        the random number generators accordingly.
+
+        Sessions cannot be recorded or replayed while executing in parallel,
+        since the order in which subsystems in the same tier consume random
+        numbers is then not deterministic.
+
+        :param params: A dictionary of user-modified parameters.
+        :raise ValueError: If a session is to be recorded or replayed while
+        executing in parallel.
+        """
+        record_path = params.get("kernel.record", None)
+        replay_path = params.get("kernel.replay", None)
+        seed = params.get("kernel.seed", None)
+
+        if params.get("kernel.parallel", False) and \
+                (record_path is not None or replay_path is not None):
+            raise ValueError('Sessions cannot be recorded or replayed while '
+                             'executing in parallel.')
+
+        if replay_path is not None and self.replay is None:
+            self.replay = SessionReplay(replay_path)
+            seed = self.replay.seed
+            logging.info("Replaying %d frames from %s." %
+                         (len(self.replay.frames), replay_path))
+        elif record_path is not None and self.recorder is None:
+            if seed is None:
+                seed = random.SystemRandom().getrandbits(64)
+            self.recorder = SessionRecorder(record_path, seed)
+            logging.info("Recording session to %s." % record_path)
+
+        if seed is not None:
+            seed_all(seed)
+
+    def _initialize_subsystem(self, subsystem, params):
+        """
+        Initializes the specified subsystem and logs how long it took.
+
+        :param subsystem: The subsystem to initialize.
+        :param params: A dictionary of user-modified parameters.
+        :raise SubSystemError: If the subsystem encountered a critical error
+        during initialization.
+        """
+        with self._initializing(subsystem):
+            subsystem.initialize(params, self)
+
+    @contextmanager
+    def _initializing(self, subsystem):
+        """
+        Creates a context in which the specified subsystem is initialized,
+        tracing and timing it and logging any critical error.
+
+        :param subsystem: The subsystem being initialized.
+        :raise SubSystemError: If the subsystem encountered a critical error
+        during initialization.
+        """
+        start_time = time.perf_counter()
+        if self.tracer is not None:
+            self.tracer.begin(subsystem.name, "init")
+        try:
+            yield
+        except SubSystemError:
+            logging.critical("Caught subsystem initialization error from "
+                             "<i>%s</i>; notifying the caller." %
+                             subsystem.name)
+            raise
+        finally:
+            if self.tracer is not None:
+                self.tracer.end(subsystem.name, "init")
+        self.init_times[subsystem.name] = time.perf_counter() - start_time
+        logging.info("Initialized <i>%s</i> in %.3f ms." %
+                     (subsystem.name, self.init_times[subsystem.name] * 1000.0))
 
     def remove(self, name):
         """
@@ -235,12 +735,23 @@ class Kernel:
         """
         if self.subsystems[name]:
             del self.subsystems[name]
+            self.plans.clear()
+            self.needs_reset = True
 
     def run(self):
         """
         Initiates an infinite loop within which each subsystem is updated
         atomically with the current elapsed time (in seconds).
 
+        If the kernel has a fixed tick rate, then fixed step subsystems are
+        instead updated with a constant delta time zero or more times per
+        frame, while all others are updated once per frame as usual.
+
+        Each frame is paced by the kernel's frame limiter, whose achieved
+        frame time and jitter are logged when the loop exits.  When replaying
+        a session, frames are not paced and the loop also exits once the
+        session has been replayed in full.
+
         The loop is stopped if any subsystem's update method returns False or if
         the kernel flag is signaled.
 
@@ -251,32 +762,565 @@ class Kernel:
         :raise ValueError: If the kernel is already running or there are no
         subsystems available for use.
         """
+        fixed, frame = self._begin()
+        self.limiter.start()
+        next_report = self.timer.current_time + self.stats_interval
+
+        try:
+            while self.is_running:
+                self.timer.update()
+                delta_time = self._next_delta_time(self.timer.delta_time)
+                if delta_time is None:
+                    logging.info("Finished replaying the session.")
+                    self.is_running = False
+                    break
+                self._frame(fixed, frame, delta_time)
+                next_report = self._maintain(next_report)
+                if self.replay is None:
+                    self.limiter.wait()
+        finally:
+            self._end()
+            logging.info("Kernel averaged %.3f ms per frame with %.3f ms of "
+                         "jitter." % (self.limiter.frame_time * 1000.0,
+                                      self.limiter.jitter * 1000.0))
+
+    def run_for(self, duration, delta_time=None):
+        """
+        Advances the simulation by (at least) the specified amount of
+        simulated time as quickly as possible.
+
+        :param duration: The amount of simulated time in seconds.
+        :param delta_time: The amount of time in seconds to advance by each
+        frame; this defaults to a single fixed tick if the kernel has a tick
+        rate and to one sixtieth of a second otherwise.
+        :return: The timing statistics, as returned by "step".
+        :raise AppExitSignal: If a subsystem signals the application should
+        close.
+        :raise SubSystemError: If a subsystem encounters a critical error.
+        :raise ValueError: If the kernel is already running, there are no
+        subsystems, or the delta time is not positive.
+        """
+        if delta_time is None:
+            delta_time = 1.0 / (self.tick_rate if self.tick_rate > 0 else 60)
+        if delta_time <= 0:
+            raise ValueError('The delta time must be positive.')
+        # Allow for floating-point error, so that e.g. 8.3 seconds at 30 Hz is
+        # 249 frames rather than 250.
+        return self.step(math.ceil(duration / delta_time - 1e-9), delta_time)
+
+    def step(self, frames=1, delta_time=None):
+        """
+        Executes the specified number of frames using exactly the same update
+        pipeline as "run" and then returns.
+
+        Unlike "run", frames are never paced by the frame limiter, so that
+        this may be used to benchmark the kernel or drive it in batches.  If
+        a session is being replayed, its delta times are used instead of the
+        specified one and execution stops early if it runs out of frames.
+
+        Consecutive calls continue the same run: time left in the fixed tick
+        accumulator and towards each subsystem's next scheduled update is
+        carried over from one call to the next, so stepping one frame at a
+        time advances the simulation exactly as stepping many frames at once
+        does.  Call "reset" to start a new run instead.
+
+        The returned statistics contain the number of "frames" and fixed
+        "ticks" that were executed by this call, the wall-clock time that
+        "elapsed", the amount of time that was "simulated" (all in seconds),
+        and the summary of each subsystem's update durations by name under
+        "subsystems".  The summaries only cover the updates made by this
+        call and, since the kernel's statistics are kept over a rolling
+        window, only the most recent 300 of those for each subsystem.
+
+        :param frames: The number of frames to execute.
+        :param delta_time: The amount of time in seconds to advance by each
+        frame, or None to use the actual elapsed time.
+        :return: A dictionary of timing statistics.
+        :raise AppExitSignal: If a subsystem signals the application should
+        close.
+        :raise SubSystemError: If a subsystem encounters a critical error.
+        :raise ValueError: If the kernel is already running or there are no
+        subsystems available for use.
+        """
+        fixed, frame = self._begin(reset=False)
+        executed = 0
+        simulated = 0.0
+        start_stats = self.stats.mark()
+        start_ticks = self.ticks
+        start_time = time.perf_counter()
+
+        try:
+            while executed < frames:
+                self.timer.update()
+                frame_time = self._next_delta_time(
+                    self.timer.delta_time if delta_time is None
+                    else delta_time)
+                if frame_time is None:
+                    break
+                self._frame(fixed, frame, frame_time)
+                if self.collector is not None:
+                    self.collector.collect(0.0)
+                executed += 1
+                simulated += frame_time
+        finally:
+            self._end()
+
+        return {"frames": executed,
+                "ticks": self.ticks - start_ticks,
+                "elapsed": time.perf_counter() - start_time,
+                "simulated": simulated,
+                "subsystems": self.stats.summaries(start_stats)}
+
+    def reset(self):
+        """
+        Resets the per-run state of this kernel, discarding any accumulated
+        time, scheduled updates, tick count, and statistics, and restarts its
+        timer.
+        """
+        self.accumulator = 0.0
+        self.alpha = 0.0
+        self.schedules = dict()
+        self.stats.reset([subsystem.name for subsystem
+                          in self.subsystems.values()] + ["kernel", "gc"])
+        self.ticks = 0
+        self.timer.start()
+        self.rate_start = (self.timer.current_time, 0)
+        self.simulation_rate = 0.0
+        self.needs_reset = False
+
+    def _begin(self, reset=True):
+        """
+        Prepares this kernel to execute frames, resetting its per-run state
+        if requested or necessary, and marks it as running.
+
+        If the per-run state is kept, the timer is restarted nonetheless so
+        that the time spent outside of the kernel is not counted as a frame.
+
+        :param reset: Whether or not to begin a new run rather than continue
+        the previous one.
+        :return: The tiers of fixed step subsystems and the tiers of
+        subsystems that are updated once per frame.
+        :raise ValueError: If the kernel is already running or there are no
+        subsystems available for use.
+        """
         if self.is_running:
             raise ValueError('Kernel is already running.')
 
         if not self.subsystems:
             raise ValueError('There are no subsystems available for use.')
 
-        exec_order = _get_execution_order('update', self.subsystems)
+        plan = self.get_plan('update')
+        if self.tick_rate > 0:
+            fixed = _select_tiers(plan, True)
+            frame = _select_tiers(plan, False)
+        else:
+            fixed, frame = [], plan
+
+        if reset or self.needs_reset:
+            self.reset()
+        else:
+            self.timer.start()
+        self.events.set_order(subsystem.name for subsystem
+                              in self.get_execution_order('update'))
+        if self.collector is not None:
+            self.collector.start()
         self.is_running = True
-        self.timer.start()
+        return fixed, frame
+
+    def _maintain(self, next_report):
+        """
+        Performs the housekeeping due between frames: measuring the
+        simulation rate, logging the kernel statistics if it is time to do
+        so, and collecting garbage with whatever time remains before the next
+        frame.
+
+        While the time scale is not real time, the simulation rate is logged
+        once per second.
+
+        :param next_report: The time at which the statistics should next be
+        logged.
+        :return: The time at which the statistics should next be logged.
+        """
+        elapsed = self.timer.current_time - self.rate_start[0]
+        if elapsed >= 1.0:
+            self.simulation_rate = (self.ticks - self.rate_start[1]) / elapsed
+            self.rate_start = (self.timer.current_time, self.ticks)
+            if self.tick_rate > 0 and self.time_scale != 1:
+                logging.info("Simulating %.1f ticks per second at a time "
+                             "scale of %s." %
+                             (self.simulation_rate,
+                              "%gx" % self.time_scale if self.time_scale
+                              else "unlimited"))
+        if 0 < self.stats_interval and next_report <= self.timer.current_time:
+            logging.info("Kernel statistics (ms):\n%s" % self.stats.report())
+            next_report = self.timer.current_time + self.stats_interval
+        if self.collector is not None:
+            self.collector.collect(self.limiter.remaining()
+                                   if self.replay is None else 0.0)
+        return next_report
+
+    def _end(self):
+        """
+        Marks this kernel as no longer running and undoes any per-run changes
+        to the interpreter.
+        """
+        if self.collector is not None:
+            self.collector.stop()
+        self.is_running = False
+
+    def _frame(self, fixed, frame, delta_time):
+        """
+        Executes a single frame, updating the fixed step subsystems as many
+        times as the specified delta time allows and every other subsystem
+        exactly once, and then delivers the frame's messages.
+
+        :param fixed: The tiers of fixed step subsystems.
+        :param frame: The tiers of subsystems to update once per frame.
+        :param delta_time: The amount of time in seconds since the previous
+        frame.
+        :raise AppExitSignal: If a subsystem signals the application should
+        close.
+        :raise SubSystemError: If a subsystem encounters a critical error.
+        """
+        start_time = self._begin_frame()
+        if fixed:
+            self._tick(fixed, delta_time)
+            self._interpolate(frame)
+        self._update(frame, delta_time)
+        self._end_frame(start_time)
+
+    def _begin_frame(self):
+        """
+        Begins tracing and timing a single frame.
+
+        :return: The time at which the frame began.
+        """
+        if self.profile_requested:
+            self.profile_requested = False
+            self.toggle_profiler()
+        if self.tracer is not None:
+            self.tracer.begin("frame")
+        if self.allocations is not None:
+            self.allocations.begin_frame()
+        return time.perf_counter()
+
+    def _end_frame(self, start_time):
+        """
+        Waits for every job submitted during the current frame, delivers the
+        messages published during it, checks every subsystem against its
+        budget, and finishes tracing and timing the frame.
+
+        :param start_time: The time at which the frame began.
+        :raise SubSystemError: If a job submitted during the frame failed.
+        """
+        try:
+            self.jobs.join()
+        except JobError as error:
+            logging.critical("Caught job error during the frame; notifying "
+                             "the caller.")
+            self.is_running = False
+            raise SubSystemError(str(error)) from error.__cause__
+
+        self.events.dispatch()
+        self.watchdog.end_frame()
+        if self.profiler.is_running:
+            self.profiler.end_frame()
+
+        if self.tracer is not None:
+            self.tracer.end("frame")
+        self.stats.record("kernel", time.perf_counter() - start_time)
+
+    def _interpolate(self, tiers):
+        """
+        Informs every subsystem in the specified tiers how far the simulation
+        has progressed towards the next fixed tick.
+
+        :param tiers: The tiers of subsystems that are updated once per frame.
+        """
+        for tier in tiers:
+            for subsystem in tier:
+                subsystem.interpolate(self.alpha)
+
+    def _next_delta_time(self, delta_time):
+        """
+        Determines the delta time of the next frame, reading it from the
+        session being replayed or writing it to the one being recorded.
+
+        :param delta_time: The delta time to use if no session is being
+        replayed.
+        :return: The next frame's delta time in seconds, or None if the
+        session being replayed has no more frames.
+        """
+        if self.replay is not None:
+            return self.replay.read_frame()
+        if self.recorder is not None:
+            self.recorder.write_frame(delta_time)
+        return delta_time
+
+    def _tick(self, subsystems, delta_time):
+        """
+        Consumes as much of the elapsed frame time as possible by updating
+        the specified subsystems in fixed increments.
+
+        If the maximum number of steps is reached and there is still more than
+        a single tick of time remaining, the excess is discarded so that an
+        overloaded kernel does not fall further and further behind.
+
+        The elapsed frame time is multiplied by the time scale first, as is
+        the maximum number of steps, so that fast-forwarding executes many
+        ticks per frame.  If the time scale is unlimited, ticks are instead
+        executed until the unlimited budget for the frame has been spent.
+
+        :param subsystems: The tiers of fixed step subsystems to update.
+        :param delta_time: The amount of time in seconds since the previous
+        frame.
+        """
+        for step in self._steps(delta_time):
+            self._update(subsystems, step)
+
+    def _steps(self, delta_time):
+        """
+        Adds the specified delta time to the accumulator and yields the
+        length of each fixed tick that should be executed to consume it, as
+        described by "_tick".
+
+        :param delta_time: The amount of time in seconds since the previous
+        frame.
+        :return: A generator of fixed tick lengths in seconds.
+        """
+        step = 1.0 / self.tick_rate
+        steps = 0
+
+        if self.time_scale == 0:
+            deadline = time.perf_counter() + self.unlimited_budget
+            while steps == 0 or time.perf_counter() < deadline:
+                yield step
+                self.ticks += 1
+                steps += 1
+            self.accumulator = 0.0
+            self.alpha = 0.0
+            return
+
+        max_steps = self.max_steps
+        if self.limiter.idle and self.limiter.idle_fps > 0:
+            max_steps = max(max_steps,
+                            math.ceil(self.tick_rate / self.limiter.idle_fps))
+        max_steps = math.ceil(max_steps * max(1.0, self.time_scale))
+        self.accumulator += delta_time * self.time_scale
+        while self.accumulator >= step and steps < max_steps:
+            yield step
+            self.accumulator -= step
+            self.ticks += 1
+            steps += 1
+
+        if self.accumulator >= step:
+            logging.debug("Kernel fell behind by %f seconds; discarding the "
+                          "excess." % (self.accumulator - step))
+            self.accumulator %= step
+        self.alpha = self.accumulator / step
+
+    def _execute(self, tier, call):
+        """
+        Executes the specified call once for every subsystem in the
+        specified tier, waiting for all of them to finish before returning.
+
+        If the kernel is executing in parallel then the calls are made
+        concurrently; those for subsystems that must run on the main thread
+        are made on the calling thread while the others run on the pool.
+        Should more than one of them raise an exception, errors take
+        precedence over exit requests.
 
-        while self.is_running:
-            self.timer.update()
-            for subsystem in exec_order:
+        :param tier: The subsystems to execute the call for.
+        :param call: The function to call with each subsystem.
+        """
+        if self.executor is None or len(tier) == 1:
+            for subsystem in tier:
+                call(subsystem)
+            return
+
+        futures = [self.executor.submit(call, subsystem) for subsystem in tier
+                   if not subsystem.main_thread]
+
+        errors = []
+        for subsystem in tier:
+            if subsystem.main_thread:
                 try:
-                    subsystem.update(self.timer.delta_time)
-                except AppExitSignal:
-                    logging.info("Caught application exit request from "
-                                 "<i>%s</i>; cleanly exiting kernel update "
-                                 "loop." % subsystem.name)
-                    self.is_running = False
-                    raise
-                except SubSystemError:
-                    logging.critical("Caught subsystem error from <i>%s</i>; "
-                                     "notifying the caller." % subsystem.name)
-                    self.is_running = False
-                    raise
+                    call(subsystem)
+                except Exception as error:
+                    errors.append(error)
+        wait(futures)
+
+        errors.extend(future.exception() for future in futures
+                      if future.exception() is not None)
+        if errors:
+            raise next((error for error in errors
+                        if not isinstance(error, AppExitSignal)), errors[0])
+
+    def _update(self, tiers, delta_time):
+        """
+        Updates each of the specified tiers of subsystems, in order, with the
+        specified delta time.
+
+        :param tiers: The tiers of subsystems to update.
+        :param delta_time: The amount of time in seconds to update with.
+        :raise AppExitSignal: If a subsystem signals the application should
+        close.
+        :raise SubSystemError: If a subsystem encounters a critical error.
+        """
+        update = partial(self._update_subsystem, delta_time=delta_time)
+        for tier in tiers:
+            self._execute(tier, update)
+
+    def _update_subsystem(self, subsystem, delta_time):
+        """
+        Updates the specified subsystem with the specified delta time.
+
+        If the subsystem has its own update rate and is not yet due for an
+        update, then the delta time is accumulated and the update is skipped.
+        Otherwise, the subsystem is updated with all of the time that has
+        elapsed since it was last updated.
+
+        :param subsystem: The subsystem to update.
+        :param delta_time: The amount of time in seconds to update with.
+        :raise AppExitSignal: If the subsystem signals the application should
+        close.
+        :raise SubSystemError: If the subsystem encounters a critical error.
+        """
+        delta_time = self._schedule(subsystem, delta_time)
+        if delta_time is not None:
+            with self._updating(subsystem):
+                subsystem.update(delta_time)
+
+    def _schedule(self, subsystem, delta_time):
+        """
+        Accumulates the specified delta time for the specified subsystem and
+        determines whether or not it is due for an update.
+
+        The update rate is read on every call, so that it may be changed
+        while the kernel is running.  A subsystem without an update rate is
+        due on every pass and is given any time it accumulated while it had
+        one.
+
+        :param subsystem: The subsystem to schedule.
+        :param delta_time: The amount of time in seconds to update with.
+        :return: The amount of time in seconds to update the subsystem with,
+        or None if it should not be updated.
+        """
+        if subsystem.update_rate <= 0:
+            schedule = self.schedules.pop(subsystem, None)
+            return delta_time if schedule is None else \
+                schedule[0] + delta_time
+
+        schedule = self.schedules.setdefault(subsystem, [0.0, 0.0])
+        period = 1.0 / subsystem.update_rate
+        schedule[0] += delta_time
+        schedule[1] += delta_time
+        if schedule[1] < period:
+            return None
+
+        delta_time = schedule[0]
+        schedule[0] = 0.0
+        schedule[1] = (schedule[1] - period) % period
+        return delta_time
+
+    @contextmanager
+    def _instrumenting(self, name):
+        """
+        Creates a context whose allocations and duration are attributed to
+        the specified name by the allocation tracker and the tracer, if
+        either is active.
+
+        :param name: The name of the subsystem, or subsystems, being updated.
+        """
+        tracking = self.allocations is not None and \
+            self.allocations.is_sampling
+        if tracking:
+            self.allocations.enter("subsystem:%s" % name)
+        if self.tracer is not None:
+            self.tracer.begin(name, "update")
+        try:
+            yield
+        finally:
+            if self.tracer is not None:
+                self.tracer.end(name, "update")
+            if tracking:
+                self.allocations.exit()
+
+    @contextmanager
+    def _updating(self, subsystem, instrument=True):
+        """
+        Creates a context in which the specified subsystem is updated,
+        tracing and timing it and stopping the kernel if it signals that it
+        should.
+
+        :param subsystem: The subsystem being updated.
+        :param instrument: Whether or not the update is traced and its
+        allocations tracked on its own, which is only possible if nothing
+        else runs on the same thread until it finishes.
+        :raise AppExitSignal: If the subsystem signals the application should
+        close.
+        :raise SubSystemError: If the subsystem encounters a critical error.
+        """
+        with self._instrumenting(subsystem.name) if instrument \
+                else nullcontext():
+            start_time = time.perf_counter()
+            try:
+                yield
+            except AppExitSignal:
+                logging.info("Caught application exit request from "
+                             "<i>%s</i>; cleanly exiting kernel update "
+                             "loop." % subsystem.name)
+                self.is_running = False
+                raise
+            except SubSystemError:
+                logging.critical("Caught subsystem error from <i>%s</i>; "
+                                 "notifying the caller." % subsystem.name)
+                self.is_running = False
+                raise
+            finally:
+                duration = time.perf_counter() - start_time
+        self.stats.record(subsystem.name, duration)
+        self.watchdog.record(subsystem.name, duration)
+
+    def _on_profile_signal(self, signum, frame):
+        """
+        Requests that the profiler be toggled at the start of the next frame,
+        rather than in the middle of whatever the signal interrupted.
+
+        :param signum: The number of the signal received.
+        :param frame: The frame that was interrupted.
+        """
+        self.profile_requested = True
+
+    def set_time_scale(self, scale):
+        """
+        Sets the multiple of real time at which fixed ticks are executed.
+
+        Only fixed step subsystems are affected; those updated once per frame
+        continue to be updated once per frame, so the display presents only
+        the latest state no matter how many ticks were executed.  Note that
+        unlimited fast-forwarding depends on how quickly ticks execute and so
+        is not reproduced exactly when a session is replayed.
+
+        :param scale: The time scale, or zero for as fast as possible.
+        :raise ValueError: If the time scale is negative.
+        """
+        if scale < 0:
+            raise ValueError('The time scale must not be negative.')
+
+        if scale != self.time_scale:
+            logging.info("Time scale set to %s." %
+                         ("%gx" % scale if scale else "unlimited"))
+        self.time_scale = scale
+
+    def toggle_profiler(self):
+        """
+        Starts the sampling profiler if it is stopped and stops it, writing
+        the samples it collected, otherwise.
+
+        :return: Whether or not the profiler is now running.
+        """
+        return self.profiler.toggle()
 
     def shutdown(self):
         """
@@ -288,13 +1332,56 @@ class Kernel:
 
         :return: Whether or not the shutdown process completed without error.
         """
-        exec_order = _get_execution_order('shutdown', self.subsystems)
-        had_error = False
-        for subsystem in exec_order:
-            try:
+        failures = []
+        for subsystem in self.get_execution_order('shutdown'):
+            with self._shutting_down(subsystem, failures):
                 subsystem.shutdown()
-            except SubSystemError:
-                logging.exception("The subsystem <i>%s</i> did not shutdown "
-                                  "correctly." % subsystem.name)
-                had_error = True
-        return not had_error
+        self._release()
+        return not failures
+
+    @contextmanager
+    def _shutting_down(self, subsystem, failures):
+        """
+        Creates a context in which the specified subsystem is shutdown,
+        tracing it and logging, rather than raising, any error.
+
+        :param subsystem: The subsystem being shutdown.
+        :param failures: A list to append the subsystem's name to if it did
+        not shutdown correctly.
+        """
+        if self.tracer is not None:
+            self.tracer.begin(subsystem.name, "shutdown")
+        try:
+            yield
+        except SubSystemError:
+            logging.exception("The subsystem <i>%s</i> did not shutdown "
+                              "correctly." % subsystem.name)
+            failures.append(subsystem.name)
+        finally:
+            if self.tracer is not None:
+                self.tracer.end(subsystem.name, "shutdown")
+
+    def _release(self):
+        """
+        Releases the resources held by this kernel itself once all of its
+        subsystems have been shutdown.
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        self.jobs.shutdown()
+        self.profiler.stop()
+        if self.profile_handler is not None:
+            signal.signal(signal.SIGUSR1, self.profile_handler)
+            self.profile_handler = None
+        if self.allocations is not None:
+            memory.set_tracker(None)
+            self.allocations.stop()
+            self.allocations = None
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        if self.tracer is not None:
+            tracing.set_tracer(None)
+            self.tracer.close()
+            self.tracer = None
@@ -5,21 +5,77 @@ The main driver for Caysen, a small, example roguelike village that is used
 to explore artificial intelligence algorithms that emphasize emotional
 awareness and social cognition.
 """
+import argparse
 import logging
 import sys
+import time
 
-from caysen.config import create_kernel, get_combined_params
-from caysen.kernel import SubSystemError, AppExitSignal
+from caysen.util.startup import ImportTimer
 
 
-def main():
+def profile_startup(kernel, params, timer):
+    """
+    Initializes the specified kernel, reports how long importing and
+    initializing took, and then shuts it down again without running it.
+
+    :param kernel: The kernel to profile.
+    :param params: A dictionary of user-modified parameters.
+    :param timer: The timer that measured the application's imports so far.
+    :return: An exit code.
+    """
+    start_time = time.perf_counter()
+    with timer:
+        kernel.initialize(params)
+    init_time = time.perf_counter() - start_time
+    kernel.shutdown()
+
+    print("Imports: %.3f ms" % (timer.total() * 1000.0))
+    print(timer.report())
+    print()
+    print("Initialization: %.3f ms" % (init_time * 1000.0))
+    for name, duration in sorted(kernel.init_times.items(),
+                                 key=lambda item: item[1], reverse=True):
+        print("%-40s %10.3f" % (name, duration * 1000.0))
+    return 0
+
+
+def main(argv=None):
     """
     The application entry point.
 
+    :param argv: The command line arguments, or None to use sys.argv.
     :return: An exit code.
     """
-    params = get_combined_params('data/config.yml')
-    kernel = create_kernel()
+    parser = argparse.ArgumentParser(
+        description="Runs the Caysen village simulation.")
+    parser.add_argument("--headless", action="store_true",
+                        help="run without a window, audio, or input")
+    parser.add_argument("--asyncio", action="store_true",
+                        help="run the kernel inside an asyncio event loop")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="report how long importing and initializing "
+                             "take, then exit without running")
+    args = parser.parse_args(argv)
+
+    # The kernel and its subsystems are imported here, rather than at the top
+    # of this module, so that the time spent importing them may be profiled.
+    timer = ImportTimer()
+    with timer:
+        from caysen.config import create_kernel, get_combined_params
+        from caysen.kernel import SubSystemError, AppExitSignal
+
+        params = get_combined_params('data/config.yml')
+        kernel = create_kernel(args.headless or params.get("headless", False),
+                               params.get("kernel.replay") is not None)
+
+    if args.startup_profile:
+        return profile_startup(kernel, params, timer)
+
+    if args.asyncio:
+        import asyncio
+
+        from caysen.driver import AsyncKernelDriver
+        return asyncio.run(AsyncKernelDriver(kernel).main(params))
 
     try:
         kernel.initialize(params)
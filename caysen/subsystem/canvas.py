@@ -0,0 +1,482 @@
+"""
+Contains the drawing operations shared by every canvas, all of which work
+on planes of characters and colors stored in NumPy arrays.
+"""
+from caysen.util import backends
+
+DEFAULT_FG = (255, 255, 255)
+
+DEFAULT_BG = (0, 0, 0)
+
+# Beyond this many dirty rectangles per frame, they are replaced by their
+# bounding box rather than being merged individually.
+_MAX_DIRTY = 32
+
+
+def _to_code(char):
+    """
+    Converts the specified character into its integer code point.
+
+    :param char: A single character string or an integer code point.
+    :return: The code point.
+    """
+    return ord(char) if isinstance(char, str) else char
+
+
+def _merge(rects):
+    """
+    Merges every pair of the specified rectangles that overlap or touch
+    into their bounding box until no such pair remains.
+
+    :param rects: A list of rectangles, each given by its left, top, right,
+    and bottom bounds.
+    :return: A list of rectangles that neither overlap nor touch.
+    """
+    merged = []
+    for rect in rects:
+        left, top, right, bottom = rect
+        index = 0
+        while index < len(merged):
+            other = merged[index]
+            if left <= other[2] and other[0] <= right and \
+                    top <= other[3] and other[1] <= bottom:
+                left, top = min(left, other[0]), min(top, other[1])
+                right, bottom = max(right, other[2]), max(bottom, other[3])
+                # The enlarged rectangle may now touch ones already passed.
+                del merged[index]
+                index = 0
+            else:
+                index += 1
+        merged.append((left, top, right, bottom))
+    return merged
+
+
+class PlanarCanvas:
+    """
+    Represents a surface on which ASCII characters may be drawn whose tiles
+    are stored as three planes: the code point of each tile's character and
+    its foreground and background colors.
+
+    Besides drawing individual tiles, rectangles, and strings, whole regions
+    may be written from arrays in a single call with "draw_array" and
+    "blit_array", so that drawing a large map costs a handful of vectorized
+    operations rather than a call per tile.  Every operation is clipped to
+    the bounds of the canvas.
+
+    As with TDL, negative coordinates given to "draw", "erase", "fill",
+    "outline", and "write" count back from the right and bottom edges, so
+    that (-1, -1) is the bottom right tile.  Arrays, on the other hand, may
+    be drawn partly off the canvas by giving them negative coordinates.
+
+    Every operation also marks the region it drew on as dirty, so that only
+    the regions that may have changed need to be compared and presented at
+    the end of the frame (see "take_changes").  Code that writes to the
+    planes directly must mark the regions it changes itself.
+
+    The planes are allocated by the canvas itself unless existing arrays,
+    such as views of a console's buffers, are given to draw on instead.
+
+    Attributes:
+        bg (numpy.ndarray): The background color of each tile as a height by
+        width by three array of bytes.
+        chars (numpy.ndarray): The code point of each tile's character as a
+        height by width array.
+        dirty (list): The left, top, right, and bottom bounds of every region
+        drawn on since changes were last taken.
+        fg (numpy.ndarray): The foreground color of each tile as a height by
+        width by three array of bytes.
+        height (int): The height of the canvas in tiles.
+        name (str): The unique name for the canvas.
+        presented (tuple): Copies of the planes as they were when changes
+        were last taken, or None if they never have been.
+        width (int): The width of the canvas in tiles.
+    """
+
+    def __init__(self, name, width, height, planes=None):
+        """
+        Constructor.
+
+        :param name: The unique name to use.
+        :param width: The width of the canvas.
+        :param height: The height of the canvas.
+        :param planes: The character, foreground, and background planes to
+        draw on, or None to allocate new ones.
+        """
+        np = backends.import_numpy()
+
+        if planes is None:
+            planes = (np.full((height, width), ord(' '), dtype=np.intc),
+                      np.full((height, width, 3), DEFAULT_FG, dtype=np.uint8),
+                      np.zeros((height, width, 3), dtype=np.uint8))
+
+        self.chars, self.fg, self.bg = planes
+        self.dirty = []
+        self.height = height
+        self.name = name
+        self.presented = None
+        self.width = width
+
+    def blit_array(self, tiles, x=0, y=0, chars=None, fg=None, bg=None):
+        """
+        Draws the specified two-dimensional array of tile indices on this
+        canvas with its top left corner at the specified x- and y-axis
+        coordinates, looking up the character and colors of each tile in the
+        specified tables.
+
+        For example, a map whose tiles are indices into a table of terrain
+        may be drawn with a single call by passing the characters and colors
+        of each kind of terrain.  Any table that is None leaves its plane
+        unchanged.
+
+        :param tiles: A height by width array of integer indices.
+        :param x: The x-axis coordinate of the top left tile to draw on.
+        :param y: The y-axis coordinate of the top left tile to draw on.
+        :param chars: The code point of each kind of tile.
+        :param fg: The foreground color of each kind of tile, as an array of
+        shape (kinds, 3).
+        :param bg: The background color of each kind of tile, as an array of
+        shape (kinds, 3).
+        """
+        region = self._clip(x, y, tiles.shape[1], tiles.shape[0])
+        if region is None:
+            return
+
+        target, source = region
+        tiles = tiles[source]
+        if chars is not None:
+            self.chars[target] = backends.np.asarray(chars)[tiles]
+        if fg is not None:
+            self.fg[target] = backends.np.asarray(fg)[tiles]
+        if bg is not None:
+            self.bg[target] = backends.np.asarray(bg)[tiles]
+
+    def contains(self, point):
+        """
+        Determines whether or not the specified point, given as a pair of
+        coordinates in x-y space, is contained within the bounds of this
+        canvas.
+
+        :param point: The point to check.
+        :return: True if the point is within the canvas bounds, otherwise
+        False.
+        """
+        x, y = point
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def draw(self, x, y, char=None, fg=DEFAULT_FG, bg=None):
+        """
+        Draws the specified character on this canvas at the specified
+        x- and y-axis coordinates and with the specified color attributes.
+
+        As with TDL, any attribute that is None is left unchanged.
+
+        :param x: The x-axis coordinate of the tile to draw on.
+        :param y: The y-axis coordinate of the tile to draw on.
+        :param char: The ASCII symbol to use as the foreground character.
+        :param fg: The foreground color.
+        :param bg: The background color.
+        """
+        self.fill(x, y, 1, 1, char, fg, bg)
+
+    def draw_array(self, x, y, chars=None, fg=None, bg=None):
+        """
+        Copies the specified planes onto this canvas with their top left
+        corner at the specified x- and y-axis coordinates.
+
+        Every plane that is given must have the same height and width; any
+        that is None is left unchanged.
+
+        :param x: The x-axis coordinate of the top left tile to draw on.
+        :param y: The y-axis coordinate of the top left tile to draw on.
+        :param chars: A height by width array of code points.
+        :param fg: A height by width by three array of foreground colors.
+        :param bg: A height by width by three array of background colors.
+        :raise ValueError: If no plane is given.
+        """
+        planes = [plane for plane in (chars, fg, bg) if plane is not None]
+        if not planes:
+            raise ValueError('At least one plane must be given.')
+
+        region = self._clip(x, y, planes[0].shape[1], planes[0].shape[0])
+        if region is None:
+            return
+
+        target, source = region
+        if chars is not None:
+            self.chars[target] = chars[source]
+        if fg is not None:
+            self.fg[target] = fg[source]
+        if bg is not None:
+            self.bg[target] = bg[source]
+
+    def erase(self, x, y):
+        """
+        Clears the character located at the specified x- and y-axis
+        coordinates on this canvas by, essentially, inserting a space in its
+        place.
+
+        :param x: The x-axis coordinate of the tile to clear.
+        :param y: The y-axis coordinate of the tile to clear.
+        """
+        self.fill(x, y, 1, 1, ' ')
+
+    def fill(self, x, y, width=None, height=None, char=None,
+             fg=DEFAULT_FG, bg=None):
+        """
+        Draws a filled rectangle on this canvas at the specified x- and y-axis
+        coordinates and with the specified width, height, and color
+        attributes and with the specified character, if any.
+
+        If the width or height is not given, the rectangle extends to the
+        edge of the canvas.
+
+        :param x: The x-axis coordinate of the tile to draw on.
+        :param y: The y-axis coordinate of the tile to draw on.
+        :param width: The width of the filled rectangle to draw.
+        :param height: The height of the filled rectangle to draw.
+        :param char: The ASCII symbol to use as a foreground character.
+        :param fg: The foreground color.
+        :param bg: The background color.
+        """
+        x, y = self._normalize(x, y)
+        width = self.width - x if width is None else width
+        height = self.height - y if height is None else height
+        region = self._clip(x, y, width, height)
+        if region is None:
+            return
+
+        target, _ = region
+        if char is not None:
+            self.chars[target] = _to_code(char)
+        if fg is not None:
+            self.fg[target] = fg
+        if bg is not None:
+            self.bg[target] = bg
+
+    def mark(self, x=0, y=0, width=None, height=None):
+        """
+        Marks the rectangle at the specified x- and y-axis coordinates and
+        with the specified width and height as dirty.
+
+        If the width or height is not given, the rectangle extends to the
+        edge of the canvas.
+
+        :param x: The x-axis coordinate of the rectangle's top left tile.
+        :param y: The y-axis coordinate of the rectangle's top left tile.
+        :param width: The width of the rectangle.
+        :param height: The height of the rectangle.
+        """
+        width = self.width - x if width is None else width
+        height = self.height - y if height is None else height
+        self._clip(x, y, width, height)
+
+    def outline(self, x, y, width=None, height=None, char=None,
+                fg=DEFAULT_FG, bg=None):
+        """
+        Draws a rectangular outline on this canvas at the specified x- and
+        y-axis coordinates and with the specified width, height, and color
+        attributes and with the specified character, if any.
+
+        :param x: The x-axis coordinate of the tile to draw on.
+        :param y: The y-axis coordinate of the tile to draw on.
+        :param width: The width of the outline to draw.
+        :param height: The height of the outline to draw.
+        :param char: The ASCII symbol to use as a border.
+        :param fg: The foreground color.
+        :param bg: The background color.
+        """
+        x, y = self._normalize(x, y)
+        width = self.width - x if width is None else width
+        height = self.height - y if height is None else height
+
+        self.fill(x, y, width, 1, char, fg, bg)
+        self.fill(x, y + height - 1, width, 1, char, fg, bg)
+        self.fill(x, y, 1, height, char, fg, bg)
+        self.fill(x + width - 1, y, 1, height, char, fg, bg)
+
+    def take_changes(self):
+        """
+        Returns the regions of this canvas that have changed since changes
+        were last taken, and forgets them.
+
+        The dirty regions are merged and each is then compared against a
+        copy of the planes as they were when changes were last taken and
+        shrunk to the tiles that actually differ, so redrawing an unchanged
+        scene produces no changes at all.  The first call returns the whole
+        canvas.
+
+        :return: A list of the x- and y-axis coordinates, width, and height
+        of every changed region.
+        """
+        dirty, self.dirty = self.dirty, []
+        if self.presented is None:
+            self.presented = (self.chars.copy(), self.fg.copy(),
+                              self.bg.copy())
+            return [(0, 0, self.width, self.height)]
+
+        changes = []
+        chars, fg, bg = self.presented
+        for left, top, right, bottom in _merge(dirty):
+            region = (slice(top, bottom), slice(left, right))
+            changed = (self.chars[region] != chars[region]) | \
+                (self.fg[region] != fg[region]).any(axis=2) | \
+                (self.bg[region] != bg[region]).any(axis=2)
+            rows = backends.np.flatnonzero(changed.any(axis=1))
+            if not len(rows):
+                continue
+
+            columns = backends.np.flatnonzero(changed.any(axis=0))
+            x, y = left + int(columns[0]), top + int(rows[0])
+            width = int(columns[-1] - columns[0]) + 1
+            height = int(rows[-1] - rows[0]) + 1
+            region = (slice(y, y + height), slice(x, x + width))
+            chars[region] = self.chars[region]
+            fg[region] = self.fg[region]
+            bg[region] = self.bg[region]
+            changes.append((x, y, width, height))
+        return changes
+
+    def wipe(self):
+        """
+        Clears the entirety of this canvas.
+        """
+        self.dirty = [(0, 0, self.width, self.height)]
+        self.chars.fill(ord(' '))
+        self.fg[:] = DEFAULT_FG
+        self.bg[:] = DEFAULT_BG
+
+    def write(self, x, y, msg, fg=DEFAULT_FG, bg=None):
+        """
+        Draws the specified message on this canvas at the specified x- and
+        y-axis coordinates and with the specified color attributes.
+
+        As with TDL, messages that reach the right edge of the canvas wrap
+        around to the start of the next row.
+
+        :param x: The x-axis coordinate of the tile to start writing on.
+        :param y: The y-axis coordinate of the tile to start writing on.
+        :param msg: The message to write.
+        :param fg: The foreground color.
+        :param bg: The background color.
+        """
+        x, y = self._normalize(x, y)
+        start = y * self.width + x
+        end = min(start + len(msg), self.width * self.height)
+        if start < 0 or end <= start:
+            return
+
+        # The x-axis coordinate may still lie past either edge, so the dirty
+        # region is found from where the message actually starts and ends.
+        first, last = start // self.width, (end - 1) // self.width
+        if first == last:
+            self._clip(start % self.width, first, end - start, 1)
+        else:
+            self._clip(0, first, self.width, last - first + 1)
+
+        # Each row is assigned through its own slice, since flattening planes
+        # that view another buffer may copy them instead.
+        codes = [ord(char) for char in msg[:end - start]]
+        offset = 0
+        for row in range(first, last + 1):
+            left = max(start - row * self.width, 0)
+            right = min(end - row * self.width, self.width)
+            self.chars[row, left:right] = codes[offset:offset + right - left]
+            if fg is not None:
+                self.fg[row, left:right] = fg
+            if bg is not None:
+                self.bg[row, left:right] = bg
+            offset += right - left
+
+    def _normalize(self, x, y):
+        """
+        Converts the specified coordinates, counting negative ones back from
+        the right and bottom edges of this canvas as TDL does.
+
+        Coordinates that lie beyond the opposite edge are left unchanged so
+        that they may be clipped.
+
+        :param x: The x-axis coordinate to convert.
+        :param y: The y-axis coordinate to convert.
+        :return: The converted coordinates.
+        """
+        if -self.width <= x < 0:
+            x += self.width
+        if -self.height <= y < 0:
+            y += self.height
+        return x, y
+
+    def _clip(self, x, y, width, height):
+        """
+        Clips the rectangle with the specified position and size to the
+        bounds of this canvas and marks the visible part of it as dirty.
+
+        :param x: The x-axis coordinate of the rectangle's top left tile.
+        :param y: The y-axis coordinate of the rectangle's top left tile.
+        :param width: The width of the rectangle.
+        :param height: The height of the rectangle.
+        :return: The slices of the visible part of the rectangle within the
+        planes and within the rectangle itself, or None if no part of it is
+        visible.
+        """
+        left, top = max(x, 0), max(y, 0)
+        right = min(x + width, self.width)
+        bottom = min(y + height, self.height)
+        if right <= left or bottom <= top:
+            return None
+
+        self.dirty.append((left, top, right, bottom))
+        if len(self.dirty) > _MAX_DIRTY:
+            self.dirty = [(min(rect[0] for rect in self.dirty),
+                           min(rect[1] for rect in self.dirty),
+                           max(rect[2] for rect in self.dirty),
+                           max(rect[3] for rect in self.dirty))]
+        return ((slice(top, bottom), slice(left, right)),
+                (slice(top - y, bottom - y), slice(left - x, right - x)))
+
+
+class RendererHost:
+    """
+    Represents the handling of renderers shared by every display subsystem,
+    which draw on the display's backbuffer once per frame.
+
+    Other subsystems add renderers by publishing them to the "renderers"
+    channel, which a host creates and subscribes to during initialization
+    with "_listen_for_renderers".  Hosts must provide a "canvas" to draw on
+    and an empty "renderers" list.
+
+    Attributes:
+        renderers (list): The functions that draw to the backbuffer, each
+        called with it once per frame, in order.
+    """
+
+    def add_renderer(self, renderer):
+        """
+        Adds a function that draws to the backbuffer once per frame.
+
+        :param renderer: The function to call with the backbuffer.
+        """
+        self.renderers.append(renderer)
+
+    def _listen_for_renderers(self, kernel):
+        """
+        Creates the "renderers" channel, if necessary, and subscribes to it.
+
+        :param kernel: The kernel whose event bus to use.
+        """
+        kernel.events.channel("renderers", ("renderer",))
+        kernel.events.subscribe("renderers", self.name, self._on_renderers)
+
+    def _on_renderers(self, channel):
+        """
+        Adds every renderer published to the "renderers" channel.
+
+        :param channel: The channel the renderers were delivered on.
+        """
+        self.renderers.extend(channel.field("renderer")[:channel.count])
+
+    def _render(self):
+        """
+        Calls every renderer with the backbuffer, in order.
+        """
+        for renderer in self.renderers:
+            renderer(self.canvas)
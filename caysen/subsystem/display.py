@@ -1,21 +1,46 @@
 """
 Contains the implementation of the display framework using TDL.
 """
-import tdl
-
 from caysen.kernel import SubSystem, AppExitSignal
+from caysen.subsystem.canvas import PlanarCanvas, RendererHost
+from caysen.util import backends
+
+
+def _is_window_active():
+    """
+    Returns whether or not the main window currently has input focus.
+
+    TDL does not expose this directly, so the underlying libtcod library is
+    queried instead.  If that is not possible the window is assumed to be
+    active.
+
+    :return: Whether or not the main window is focused.
+    """
+    lib = getattr(backends.tdl, "_lib", None)
+    if lib is None or not hasattr(lib, "TCOD_console_is_active"):
+        return True
+    return bool(lib.TCOD_console_is_active())
 
 
-class Canvas:
+class Canvas(PlanarCanvas):
     """
     Represents a single, unique surface that corresponds to a console on which
     ASCII characters may be drawn.
 
+    The canvas' planes are NumPy views of the console's own character and
+    color buffers, so drawing on the canvas, including whole regions at once
+    with "draw_array" and "blit_array", writes straight into the console
+    without crossing into TDL once per tile.
+
+    The buffers can only be reached through the libtcod bindings' private
+    API, however.  If the bindings cannot be imported or lack it, the canvas
+    draws on planes of its own instead and copies the regions that changed
+    into the console one tile at a time before they are presented.
+
     Attributes:
-        name (str): The unique name for the canvas.
         console (tdl.Console): The backing TDL console.
-        height (int): The height of the canvas in tiles.
-        width (int): The width of the canvas in tiles.
+        is_shared (bool): Whether or not the planes are views of the
+        console's buffers.
     """
 
     def __init__(self, name, width, height):
@@ -26,10 +51,23 @@ class Canvas:
         :param width: The width of the backing console.
         :param height: The height of the backing console.
         """
-        self.name = name
-        self.console = tdl.Console(width, height)
-        self.height = height
-        self.width = width
+        tdl = backends.import_tdl()
+
+        console = tdl.Console(width, height)
+        # TDL does not expose its buffers itself, but the libtcod bindings
+        # can wrap the same console data.
+        planes = None
+        tcod = backends.tcod
+        if tcod is not None:
+            try:
+                buffers = tcod.console.Console._from_cdata(console.console_c)
+                planes = (buffers.ch, buffers.fg, buffers.bg)
+            except (AttributeError, TypeError):
+                pass
+
+        super().__init__(name, width, height, planes)
+        self.console = console
+        self.is_shared = planes is not None
 
     def blit(self, image, x=0, y=0):
         """
@@ -39,7 +77,10 @@ class Canvas:
         :param x: The x-axis coordinate
         :param y: The y-axis coordinate
         """
+        self._push(0, 0, self.width, self.height)
         image.blit(self.console, x, y)
+        self._pull()
+        self.mark()
 
     def blit2x(self, image, x=0, y=0):
         """
@@ -49,19 +90,10 @@ class Canvas:
         :param x: The x-axis coordinate
         :param y: The y-axis coordinate
         """
+        self._push(0, 0, self.width, self.height)
         image.blit_2x(self.console, x, y)
-
-    def contains(self, point):
-        """
-        Determines whether or not the specified point, given as a pair of
-        coordinates in x-y space, is contained within the bounds of this
-        canvas' console.
-
-        :param point: The point to check.
-        :return: True if the point is within the console bounds, otherwise
-        False.
-        """
-        return point in self.console
+        self._pull()
+        self.mark()
 
     def dispose(self):
         """
@@ -72,113 +104,110 @@ class Canvas:
         console.
         """
         if self.console:
+            # The planes view the console's buffers, which are freed with it.
+            self.chars = self.fg = self.bg = None
             del self.console
 
-    def draw(self, x, y, char=None, fg=(255, 255, 255), bg=None):
+    def present(self, x, y, width, height):
         """
-        Draws the specified character on this canvas at the specified
-        x- and y-axis coordinates and with the specified color attributes.
+        Ensures the specified region of the console matches this canvas'
+        planes so that it may be blit.
 
-        :param x: The x-axis coordinate of the tile to draw on.
-        :param y: The y-axis coordinate of the tile to draw on.
-        :param char: The ASCII symbol to use as the foreground character.
-        :param fg: The foreground color.
-        :param bg: The background color.
+        :param x: The x-axis coordinate of the region's top left tile.
+        :param y: The y-axis coordinate of the region's top left tile.
+        :param width: The width of the region.
+        :param height: The height of the region.
         """
-        self.console.draw_char(x, y, char, fg, bg)
+        self._push(x, y, width, height)
 
-    def erase(self, x, y):
+    def _pull(self):
         """
-        Clears the character located at the specified x- and y-axis
-        coordinates on this canvas by, essentially, inserting a space in its
-        place.
-
-        :param x: The x-axis coordinate of the tile to clear.
-        :param y: The y-axis coordinate of the tile to clear.
+        Copies every tile of the console into this canvas' planes, unless
+        they are views of its buffers.
         """
-        self.console.draw_char(x, y, ' ', bg=None)
+        if self.is_shared:
+            return
 
-    def fill(self, x, y, width=None, height=None, char=None,
-             fg=(255, 255, 255), bg=None):
-        """
-        Draws a filled rectangle on this canvas at the specified x- and y-axis
-        coordinates and with the specified width, height, and color
-        attributes and with the specified character, if any.
+        for row in range(self.height):
+            for column in range(self.width):
+                char, fg, bg = self.console.get_char(column, row)
+                self.chars[row, column] = char
+                self.fg[row, column] = fg
+                self.bg[row, column] = bg
 
-        :param x: The x-axis coordinate of the tile to draw on.
-        :param y: The y-axis coordinate of the tile to draw on.
-        :param width: The width of the filled rectangle to draw.
-        :param height: The height of the filled rectangle to draw.
-        :param char: The ASCII symbol to use as a foreground character.
-        :param fg: The background color.
-        :param bg: The foreground color.
+    def _push(self, x, y, width, height):
         """
-        self.console.draw_rect(x, y, width, height, char, fg, bg)
+        Copies the specified region of this canvas' planes into the console,
+        unless they are views of its buffers.
 
-    def outline(self, x, y, width=None, height=None, char=None,
-                fg=(255, 255, 255), bg=None):
+        :param x: The x-axis coordinate of the region's top left tile.
+        :param y: The y-axis coordinate of the region's top left tile.
+        :param width: The width of the region.
+        :param height: The height of the region.
         """
-        Draws a rectangular outline on this canvas at the specified x- and
-        y-axis coordinates and with the specified width, height, and color
-        attributes and with the specified character, if any.
+        if self.is_shared:
+            return
 
-        :param x: The x-axis coordinate of the tile to draw on.
-        :param y: The y-axis coordinate of the tile to draw on.
-        :param width: The width of the outline to draw.
-        :param height: The height of the outline to draw.
-        :param char: The ASCII symbol to use as a border.
-        :param fg: The background color.
-        :param bg: The foreground color.
-        """
-        self.console.draw_frame(x, y, width, height, char, fg, bg)
+        for row in range(y, y + height):
+            for column in range(x, x + width):
+                self.console.draw_char(column, row,
+                                       int(self.chars[row, column]),
+                                       tuple(self.fg[row, column].tolist()),
+                                       tuple(self.bg[row, column].tolist()))
 
-    def wipe(self):
-        """
-        Clears the entirety of this canvas.
-        """
-        self.console.clear()
-
-    def write(self, x, y, msg, fg=(255, 255, 255), bg=None):
-        """
-        Draws the specified message on this canvas at the specified x- and
-        y-axis coordinates and with the specified color attributes.
 
-        :param x: The x-axis coordinate of the tile to start writing on.
-        :param y: The y-axis coordinate of the tile to start writing on.
-        :param msg: The message to write.
-        :param fg: The foreground color.
-        :param bg: The background color.
-        """
-        self.console.draw_str(x, y, msg, fg, bg)
-
-
-class DisplaySubSystem(SubSystem):
+class DisplaySubSystem(SubSystem, RendererHost):
     """
     An implementation of SubSystem that manages a console window that is used as
     an ASCII-capable rendering surface.
 
     To prevent tearing, this implementation uses an additional offscreen
     console that is, once per frame, blit to the main window via an update
-    function.  All users should draw to the offscreen buffer only.
+    function.  All users should draw to the offscreen buffer only.  Only the
+    regions of the backbuffer that actually changed during the frame are
+    blit, and the window is not flushed at all if nothing changed, so
+    mostly static screens cost next to nothing to present.
+
+    The display also drives the kernel's frame limiter: it sets the target
+    frame rate during initialization and switches the limiter to its idle
+    rate whenever the window loses focus.
+
+    When the kernel runs at a fixed tick rate, the display is updated once per
+    frame rather than once per tick and keeps track of how far the simulation
+    has progressed towards the next tick.  Other subsystems draw to the
+    backbuffer through renderers, which the display calls once per frame just
+    before presenting, so that only the latest state is ever drawn no matter
+    how many ticks were executed.
 
     Attributes:
+        alpha (float): The fraction of a fixed tick that has elapsed since the
+        last simulation update.
         canvas (Canvas): The backbuffer.
         font (str): The path to a bitmap font file.
         fps (int): The maximum frames per second to render the display at.
         fullscreen (bool): Whether or not the display takes up the entire
         desktop.
         height (int): The height of the display in tiles.
+        limiter (FrameLimiter): The kernel's frame limiter.
+        renderers (list): The functions that draw to the backbuffer, each
+        called with it once per frame, in order.  Other subsystems add them
+        by publishing them to the "renderers" channel.
         root (tdl.Console): The main display window.
         width (int): The width of the display in tiles.
     """
 
     def __init__(self):
         super().__init__("display")
+        self.alpha = 0.0
         self.canvas = None
+        self.fixed_step = False
         self.font = None
         self.fps = 0
         self.fullscreen = False
         self.height = 0
+        self.limiter = None
+        self.main_thread = True
+        self.renderers = []
         self.root = None
         self.width = 0
 
@@ -186,8 +215,11 @@ class DisplaySubSystem(SubSystem):
         return {"init": [], "update": ["game", "input"], "shutdown": ["game"]}
 
     def initialize(self, params, kernel):
+        tdl = backends.import_tdl()
+
         self.fullscreen = params.get("fullscreen", False)
         self.font = params.get("font", None)
+        self.fps = params.get("fps", 60)
         self.height = params.get("height", 50)
         self.title = params.get("title", "Caysen City")
         self.width = params.get("width", 80)
@@ -198,11 +230,18 @@ class DisplaySubSystem(SubSystem):
 
             tdl.set_font(self.font, greyscale, alt_layout)
 
+        self.limiter = kernel.limiter
+        self.limiter.fps = self.fps
+
         self.canvas = Canvas("backbuffer", self.width, self.height)
+        self._listen_for_renderers(kernel)
         self.root = tdl.init(self.width, self.height, title=self.title,
                              fullscreen=self.fullscreen)
         return self.root is not None
 
+    def interpolate(self, alpha):
+        self.alpha = alpha
+
     def set_fullscreen(self, fullscreen):
         """
         Sets whether or not the display is fullscreen.
@@ -211,16 +250,29 @@ class DisplaySubSystem(SubSystem):
         """
         if self.fullscreen is not fullscreen:
             self.fullscreen = fullscreen
-            tdl.set_fullscreen(self.fullscreen)
+            backends.tdl.set_fullscreen(self.fullscreen)
 
     def update(self, delta_time):
-        self.root.blit(self.canvas.console, 0, 0, self.width, self.height, 0, 0)
-        tdl.flush()
-        if tdl.event.is_window_closed():
+        self._render()
+
+        changes = self.canvas.take_changes()
+        for x, y, width, height in changes:
+            self.canvas.present(x, y, width, height)
+            self.root.blit(self.canvas.console, x, y, width, height, x, y)
+
+        # The window is repainted when it regains focus in case it was
+        # covered while nothing changed.
+        active = _is_window_active()
+        if changes or (active and self.limiter.idle):
+            backends.tdl.flush()
+        if backends.tdl.event.is_window_closed():
             raise AppExitSignal()
+        self.limiter.idle = not active
 
     def shutdown(self):
-        self.canvas.dispose()
+        if self.canvas is not None:
+            self.canvas.dispose()
+            self.canvas = None
 
         if not self.root is None:
             del self.root
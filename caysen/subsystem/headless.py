@@ -0,0 +1,85 @@
+"""
+Contains a windowless implementation of the display framework that renders
+to memory, for running simulations on machines without a display.
+"""
+from caysen.kernel import SubSystem
+from caysen.subsystem.canvas import PlanarCanvas, RendererHost
+
+
+class MemoryCanvas(PlanarCanvas):
+    """
+    Represents a surface with the same drawing interface as Canvas whose
+    planes are ordinary arrays in memory rather than the buffers of a TDL
+    console.
+    """
+
+    def blit(self, image, x=0, y=0):
+        """
+        Does nothing; images are only rasterized by TDL consoles.
+
+        :param image: The image to use.
+        :param x: The x-axis coordinate
+        :param y: The y-axis coordinate
+        """
+        pass
+
+    def blit2x(self, image, x=0, y=0):
+        """
+        Does nothing; images are only rasterized by TDL consoles.
+
+        :param image: The image to use.
+        :param x: The x-axis coordinate
+        :param y: The y-axis coordinate
+        """
+        pass
+
+    def dispose(self):
+        """
+        Does nothing; the backing arrays are released with the canvas.
+        """
+        pass
+
+
+class HeadlessDisplaySubSystem(SubSystem, RendererHost):
+    """
+    An implementation of SubSystem that stands in for the display by
+    providing an in-memory canvas and never opening a window.
+
+    Because nothing is ever presented, the headless display does not limit
+    the kernel's frame rate, allowing simulations to run as fast as possible.
+
+    Attributes:
+        canvas (MemoryCanvas): The backbuffer.
+        height (int): The height of the canvas in tiles.
+        renderers (list): The functions that draw to the backbuffer, each
+        called with it once per frame, in order.  Other subsystems add them
+        by publishing them to the "renderers" channel.
+        width (int): The width of the canvas in tiles.
+    """
+
+    def __init__(self):
+        super().__init__("display")
+        self.canvas = None
+        self.fixed_step = False
+        self.height = 0
+        self.renderers = []
+        self.width = 0
+
+    def get_dependencies(self):
+        return {"init": [], "update": ["game"], "shutdown": ["game"]}
+
+    def initialize(self, params, kernel):
+        self.height = params.get("height", 50)
+        self.width = params.get("width", 80)
+
+        kernel.limiter.fps = 0
+        self.canvas = MemoryCanvas("backbuffer", self.width, self.height)
+        self._listen_for_renderers(kernel)
+
+    def shutdown(self):
+        if self.canvas is not None:
+            self.canvas.dispose()
+            self.canvas = None
+
+    def update(self, delta_time):
+        self._render()
@@ -1,9 +1,8 @@
 """
 Contains the implementation of the input framework using TDL.
 """
-import tdl
-
 from caysen.kernel import SubSystem, AppExitSignal
+from caysen.util import backends
 
 
 class Action:
@@ -29,7 +28,7 @@ class Action:
         return NotImplemented
 
     def __hash__(self):
-        hash((self.code, self.state, self.mods))
+        return hash((self.code, self.state, self.mods))
 
     def __ne__(self, other):
         return not self == other
@@ -99,9 +98,9 @@ class ActionMap:
         if action not in self.actions:
             if self.parent is not None:
                 self.parent.fire(action, args)
-            else:
-                raise ActionNotBoundError(action + ' not bound to any '
-                                                   'callbacks.')
+                return
+            raise ActionNotBoundError('%s not bound to any callbacks.' %
+                                      action.code)
 
         for callback in self.actions[action]:
             callback(args)
@@ -156,22 +155,66 @@ class ActionMap:
 
 class InputSubSystem(SubSystem):
     """
+    An implementation of SubSystem that polls TDL for user input.
+
+    If the kernel is recording a session, every event this subsystem consumes
+    is written to the session log.  If the kernel is replaying a session,
+    events are read from the session log instead of TDL.
 
+    Every key press is fired through the action map as an action whose code
+    is the key's character (or name, for keys without one) and whose state is
+    "KEYDOWN".  The key given by "input.timeScaleKey" (by default, TAB) is
+    bound to cycling through the kernel's time scales, and the key given by
+    "input.profileKey" (by default, F9) to toggling the kernel's profiler.
+
+    Attributes:
+        actions (ActionMap): The actions that key presses are fired through.
+        recorder (SessionRecorder): The kernel's session recorder, if any.
+        replay (SessionReplay): The kernel's session replay, if any.
     """
 
     def __init__(self):
         super().__init__("input")
+        self.actions = ActionMap()
+        self.fixed_step = False
+        self.main_thread = True
+        self.recorder = None
+        self.replay = None
 
     def get_dependencies(self):
         return {"init": ["display"], "update": ["game"], "shutdown": ["game"]}
 
     def initialize(self, params, kernel):
-        pass
+        if kernel.replay is None:
+            backends.import_tdl()
+
+        self.recorder = kernel.recorder
+        self.replay = kernel.replay
+
+        key = params.get("input.timeScaleKey", "TAB")
+        self.actions.bind(Action(key, "KEYDOWN"),
+                          lambda args: kernel.cycle_time_scale())
+        key = params.get("input.profileKey", "F9")
+        self.actions.bind(Action(key, "KEYDOWN"),
+                          lambda args: kernel.toggle_profiler())
 
     def shutdown(self):
         pass
 
     def update(self, delta_time):
-        for event in tdl.event.get():
+        if self.replay is not None:
+            events = self.replay.read_events()
+        else:
+            events = list(backends.tdl.event.get())
+            if self.recorder is not None:
+                self.recorder.write_events(events)
+
+        for event in events:
             if event.type == 'QUIT':
                 raise AppExitSignal()
+            if event.type == 'KEYDOWN':
+                try:
+                    self.actions.fire(Action(event.keychar, event.type),
+                                      event)
+                except ActionNotBoundError:
+                    pass
@@ -0,0 +1,305 @@
+"""
+Contains a proxy that hosts a subsystem in a separate process, so that heavy
+subsystems (audio mixing, AI, and so on) may run truly in parallel with the
+rest of the kernel rather than competing for the global interpreter lock.
+"""
+import logging
+import multiprocessing
+import pickle
+import time
+import traceback
+
+from caysen.kernel import AppExitSignal, Kernel, SubSystem, SubSystemError
+from caysen.util.ring import SharedRingBuffer
+from caysen.util.stats import FrameStats
+
+
+def _drain(channel):
+    """
+    Removes every message published to the specified channel during the
+    current frame.
+
+    :param channel: The channel to drain.
+    :return: A list of messages, each a tuple of field values.
+    """
+    with channel.lock:
+        count = channel.pending_count
+        channel.pending_count = 0
+        return list(zip(*[column[:count] for column in channel.pending]))
+
+
+def _serve(subsystem, requests, replies, publishes):
+    """
+    Hosts the specified subsystem, executing the requests received from its
+    proxy until it is shutdown.
+
+    The subsystem is given a kernel of its own, without any other
+    subsystems, whose event bus carries the messages forwarded by the proxy.
+    Every request begins with its sequence number, which is returned at the
+    beginning of its reply.
+
+    :param subsystem: The subsystem to host.
+    :param requests: The ring buffer that requests are read from.
+    :param replies: The ring buffer that replies are written to.
+    :param publishes: The names of the channels whose messages are returned
+    to the proxy.
+    """
+    kernel = Kernel()
+    kernel.add(subsystem)
+    events = kernel.events
+
+    while True:
+        sequence, command, *arguments = pickle.loads(requests.read())
+        if command == "interpolate":
+            subsystem.interpolate(arguments[0])
+            continue
+
+        start_time = time.perf_counter()
+        try:
+            if command == "initialize":
+                for name, fields in arguments[1].items():
+                    events.channel(name, fields)
+                subsystem.initialize(arguments[0], kernel)
+            elif command == "update":
+                for name, (fields, messages) in arguments[1].items():
+                    channel = events.channel(name, fields)
+                    for message in messages:
+                        channel.publish(*message)
+                events.dispatch()
+                subsystem.update(arguments[0])
+            elif command == "shutdown":
+                subsystem.shutdown()
+            kernel.jobs.join()
+            reply = ("ok",)
+        except AppExitSignal:
+            reply = ("exit",)
+        except Exception:
+            reply = ("error", traceback.format_exc())
+
+        outbox = dict((name, (events.channels[name].fields,
+                              _drain(events.channels[name])))
+                      for name in publishes if name in events.channels)
+        replies.write(pickle.dumps(
+            (sequence,) + reply + (time.perf_counter() - start_time, outbox),
+            pickle.HIGHEST_PROTOCOL))
+
+        if command == "shutdown":
+            kernel.jobs.shutdown()
+            requests.close()
+            replies.close()
+            return
+
+
+class ProcessSubSystem(SubSystem):
+    """
+    An implementation of SubSystem that hosts another subsystem in a child
+    process and forwards every call to it.
+
+    The hosted subsystem is created in this process, so that its name,
+    dependencies, and scheduling may be read, but it is only initialized in
+    the child, which therefore only needs its constructor to be cheap.  It
+    is given a kernel of its own rather than this one and so cannot reach
+    any other subsystem directly; instead, the messages published in this
+    kernel to the channels it subscribes to are forwarded to its kernel
+    before each of its updates, and the messages it publishes to the
+    channels it publishes to are forwarded back to this kernel afterwards.
+    Parameters, delta times, and messages must therefore all be picklable.
+
+    Requests and replies are exchanged through a pair of shared memory ring
+    buffers.  Each call waits for the child to finish, so the hosted
+    subsystem runs in parallel with the others only when the kernel executes
+    in parallel; the proxy waits without holding the global interpreter
+    lock.  Errors in the child are raised from the proxy as SubSystemErrors,
+    as are the child exiting unexpectedly and a call exceeding the timeout,
+    and exit requests as AppExitSignals.  Requests are numbered so that a
+    reply that arrives after its call timed out is discarded rather than
+    mistaken for the reply to a later call.
+
+    The round trip time of every update, and the part of it not spent in the
+    hosted subsystem, are kept in the proxy's statistics as "round_trip"
+    and "overhead" respectively.
+
+    Attributes:
+        capacity (int): The number of bytes each ring buffer can hold.
+        inbox (dict): The fields and messages received on each subscribed
+        channel since the previous update, associated by channel name.
+        kernel (Kernel): The kernel this proxy belongs to.
+        process (Process): The child process, or None if it is not running.
+        publishes (list): The names of channels whose messages are forwarded
+        from the child to this kernel.
+        replies (SharedRingBuffer): The buffer the child replies through.
+        requests (SharedRingBuffer): The buffer the child is sent requests
+        through.
+        sequence (int): The number of requests sent to the child.
+        stats (FrameStats): The round trip time and overhead of each update.
+        subscribes (list): The names of channels whose messages are
+        forwarded from this kernel to the child.
+        subsystem (SubSystem): The hosted subsystem.
+        timeout (float): The maximum amount of time in seconds to wait for
+        the child to reply, or None to wait forever.
+    """
+
+    def __init__(self, subsystem, subscribes=(), publishes=(),
+                 capacity=1 << 20, timeout=None):
+        super().__init__(subsystem.name)
+        self.capacity = capacity
+        self.fixed_step = subsystem.fixed_step
+        self.inbox = dict()
+        self.kernel = None
+        self.process = None
+        self.publishes = list(publishes)
+        self.replies = None
+        self.requests = None
+        self.sequence = 0
+        self.stats = FrameStats()
+        self.subscribes = list(subscribes)
+        self.subsystem = subsystem
+        self.timeout = timeout
+        self.update_rate = subsystem.update_rate
+
+    def get_dependencies(self):
+        return self.subsystem.get_dependencies()
+
+    def initialize(self, params, kernel):
+        context = multiprocessing.get_context(
+            params.get("%s.startMethod" % self.name, None))
+        self.capacity = params.get("%s.ringCapacity" % self.name,
+                                   self.capacity)
+        self.timeout = params.get("%s.timeout" % self.name, self.timeout)
+        self.requests = SharedRingBuffer(context.Semaphore(0), self.capacity)
+        self.replies = SharedRingBuffer(context.Semaphore(0), self.capacity)
+        self.kernel = kernel
+        self.stats.reset(["round_trip", "overhead"])
+
+        self.process = context.Process(
+            target=_serve, name="caysen-%s" % self.name, daemon=True,
+            args=(self.subsystem, self.requests, self.replies,
+                  self.publishes))
+        self.process.start()
+
+        channels = dict()
+        for name in self.subscribes:
+            kernel.events.subscribe(name, self.name, self._on_message)
+            channels[name] = kernel.events.channel(name).fields
+        self._call(("initialize", params, channels))
+
+    def interpolate(self, alpha):
+        self._send(("interpolate", alpha))
+
+    def shutdown(self):
+        if self.process is None:
+            return
+
+        try:
+            self._call(("shutdown",))
+        finally:
+            self.process.join(self.timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process = None
+            self.requests.close()
+            self.replies.close()
+            if self.stats.buffers["round_trip"]:
+                summary = self.stats.summary("round_trip")
+                logging.info("<i>%s</i> averaged a round trip of %.3f ms "
+                             "(%.3f ms at the 99th percentile)." %
+                             (self.name, summary["mean"] * 1000.0,
+                              summary["p99"] * 1000.0))
+
+    def update(self, delta_time):
+        inbox, self.inbox = self.inbox, dict()
+        self._call(("update", delta_time, inbox))
+
+    def _call(self, request):
+        """
+        Sends the specified request to the child, waits for its reply, and
+        publishes the messages forwarded with it.
+
+        :param request: The request to send.
+        :raise AppExitSignal: If the hosted subsystem signals the application
+        should close.
+        :raise SubSystemError: If the hosted subsystem encountered an error,
+        the child exited, or the reply did not arrive in time.
+        """
+        start_time = time.perf_counter()
+        sequence = self._send(request)
+        reply = self._receive(sequence, start_time)
+        if request[0] == "update":
+            round_trip = time.perf_counter() - start_time
+            self.stats.record("round_trip", round_trip)
+            self.stats.record("overhead", round_trip - reply[-2])
+
+        for name, (fields, messages) in reply[-1].items():
+            channel = self.kernel.events.channel(name, fields)
+            for message in messages:
+                channel.publish(*message)
+
+        if reply[1] == "exit":
+            raise AppExitSignal()
+        if reply[1] == "error":
+            raise SubSystemError("%s failed in its process:\n%s" %
+                                 (self.name, reply[2]))
+
+    def _on_message(self, channel):
+        """
+        Keeps the messages delivered on the specified channel until they are
+        forwarded with the next update.
+
+        :param channel: The channel the messages were delivered on.
+        """
+        messages = list(zip(*[column[:channel.count]
+                              for column in channel.columns]))
+        if channel.name in self.inbox:
+            self.inbox[channel.name][1].extend(messages)
+        else:
+            self.inbox[channel.name] = (channel.fields, messages)
+
+    def _receive(self, sequence, start_time):
+        """
+        Waits for the child's reply to the specified request, checking
+        periodically that it is still running.
+
+        Replies to earlier requests, which arrived after their calls timed
+        out, are discarded.
+
+        :param sequence: The sequence number of the request.
+        :param start_time: The time at which the request was sent.
+        :return: The reply.
+        :raise SubSystemError: If the child exited or the reply did not
+        arrive in time.
+        """
+        while True:
+            message = self.replies.read(0.1)
+            if message is not None:
+                reply = pickle.loads(message)
+                if reply[0] == sequence:
+                    return reply
+                logging.warning("Discarded a late reply from %s to request "
+                                "%d." % (self.name, reply[0]))
+                continue
+            if not self.process.is_alive():
+                raise SubSystemError("The process hosting %s exited with "
+                                     "code %s." % (self.name,
+                                                   self.process.exitcode))
+            if self.timeout is not None and \
+                    time.perf_counter() - start_time >= self.timeout:
+                raise SubSystemError("%s did not reply within %.3f s." %
+                                     (self.name, self.timeout))
+
+    def _send(self, request):
+        """
+        Numbers the specified request and sends it to the child.
+
+        :param request: The request to send.
+        :return: The sequence number of the request.
+        :raise SubSystemError: If the request could not be sent in time.
+        """
+        self.sequence += 1
+        try:
+            self.requests.write(pickle.dumps((self.sequence,) + request,
+                                             pickle.HIGHEST_PROTOCOL),
+                                self.timeout)
+        except TimeoutError as error:
+            raise SubSystemError("The request to %s could not be sent." %
+                                 self.name) from error
+        return self.sequence
@@ -0,0 +1,47 @@
+"""
+Contains the lazy imports of the heavy third-party backends, NumPy and TDL,
+which are only imported the first time they are needed rather than when the
+modules that use them are loaded, so that tooling that only inspects kernels
+and headless kernels never pay for what they do not use.
+
+Modules that use a backend call its import function and then refer to it
+through this module, e.g. "backends.np".
+"""
+np = None
+
+tcod = None
+
+tdl = None
+
+
+def import_numpy():
+    """
+    Imports NumPy if it has not been imported already.
+
+    :return: The NumPy module.
+    """
+    global np
+    if np is None:
+        import numpy as np
+    return np
+
+
+def import_tdl():
+    """
+    Imports TDL, and the libtcod bindings it is built on, if they have not
+    been imported already.
+
+    The bindings are only used to reach the consoles' buffers, so TDL is
+    used without them, and "tcod" is left as None, if they cannot be
+    imported.
+
+    :return: The TDL module.
+    """
+    global tcod, tdl
+    if tdl is None:
+        try:
+            import tcod.console
+        except ImportError:
+            tcod = None
+        import tdl
+    return tdl
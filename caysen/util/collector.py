@@ -0,0 +1,109 @@
+"""
+Contains a mechanism for taking control of Python's cyclic garbage collector
+so that collections happen between frames instead of in the middle of them.
+"""
+import gc
+import time
+
+
+class FrameCollector:
+    """
+    Represents a mechanism for disabling automatic garbage collection and
+    instead collecting incrementally at frame boundaries.
+
+    Young generations are collected whenever their thresholds are reached,
+    since doing so is cheap.  The oldest generation, whose collections can
+    take a long time, is only collected once its threshold is reached and
+    the remaining frame time is at least as long as the previous full
+    collection took, or if it has been deferred for too long.
+
+    Every collection, whether made by this collector or not, is timed and
+    recorded in the given statistics as "gc".
+
+    Attributes:
+        full_time (float): How long the most recent full collection took in
+        seconds.
+        is_running (bool): Whether or not this collector has disabled
+        automatic garbage collection.
+        max_deferral (int): The multiple of the oldest generation's threshold
+        after which it is collected regardless of the remaining time.
+        start_time (float): The time at which the current collection began.
+        stats (FrameStats): The statistics to record collection pauses in.
+        was_enabled (bool): Whether or not automatic garbage collection was
+        enabled before this collector was started.
+    """
+
+    def __init__(self, stats, max_deferral=4):
+        self.full_time = 0.0
+        self.is_running = False
+        self.max_deferral = max_deferral
+        self.start_time = 0.0
+        self.stats = stats
+        self.was_enabled = gc.isenabled()
+
+    def collect(self, remaining):
+        """
+        Collects the youngest generations that are due and, if there is time,
+        the oldest generation as well.
+
+        :param remaining: The amount of time in seconds left before the next
+        frame should begin.
+        :return: The generation that was collected, or -1 if none was.
+        """
+        counts = gc.get_count()
+        thresholds = gc.get_threshold()
+
+        generation = -1
+        if counts[0] >= thresholds[0]:
+            generation = 0
+        if counts[1] >= thresholds[1]:
+            generation = 1
+        if counts[2] >= thresholds[2] and \
+                (remaining >= self.full_time or
+                 counts[2] >= thresholds[2] * self.max_deferral):
+            generation = 2
+
+        if generation >= 0:
+            gc.collect(generation)
+        return generation
+
+    def start(self):
+        """
+        Disables automatic garbage collection and begins timing collections.
+        """
+        if self.is_running:
+            return
+
+        self.was_enabled = gc.isenabled()
+        gc.disable()
+        gc.callbacks.append(self._on_collect)
+        self.is_running = True
+
+    def stop(self):
+        """
+        Restores automatic garbage collection to its previous state and stops
+        timing collections.
+        """
+        if not self.is_running:
+            return
+
+        gc.callbacks.remove(self._on_collect)
+        if self.was_enabled:
+            gc.enable()
+        self.is_running = False
+
+    def _on_collect(self, phase, info):
+        """
+        Times a single collection.
+
+        :param phase: Either "start" or "stop".
+        :param info: A dictionary of information about the collection.
+        """
+        if phase == "start":
+            self.start_time = time.perf_counter()
+            return
+
+        duration = time.perf_counter() - self.start_time
+        self.stats.record("gc", duration)
+        if info["generation"] == 2:
+            self.full_time = duration
@@ -0,0 +1,229 @@
+"""
+Contains a publish/subscribe event bus that lets subsystems exchange
+messages without holding references to one another.
+
+Messages are published to named channels, each of which has a fixed set of
+fields.  Rather than being delivered immediately, messages are collected for
+the duration of a frame and then delivered to every subscriber in a single
+batch, in the order that the subscribing subsystems are updated.  Channels
+store their messages column by column in preallocated lists that are reused
+from frame to frame, so publishing a message does not allocate any memory
+once a channel has grown to fit its busiest frame.
+"""
+import threading
+
+
+class Channel:
+    """
+    Represents a named stream of messages that all share the same fields.
+
+    Each channel is double buffered: messages are published to the pending
+    buffer while subscribers read the delivered one, and the two are
+    swapped once per frame.  Subscribers should read the delivered messages
+    through "count" and "field" (or "columns") and must not keep references
+    to the columns beyond the delivery, as they are reused.
+
+    Attributes:
+        capacity (int): The number of messages each buffer can hold before
+        it must grow.
+        columns (list): The delivered messages as one list per field.
+        count (int): The number of delivered messages.
+        fields (tuple): The names of the fields of every message.
+        indices (dict): The index of each field's column associated by name.
+        lock (threading.Lock): Guards the pending buffer so that messages
+        may be published from multiple threads.
+        name (str): The unique name of this channel.
+        pending (list): The messages published during the current frame as
+        one list per field.
+        pending_count (int): The number of messages published during the
+        current frame.
+    """
+
+    def __init__(self, name, fields, capacity=256):
+        if not fields:
+            raise ValueError('A channel must have at least one field.')
+        if capacity < 1:
+            raise ValueError('The capacity must be at least one.')
+
+        self.capacity = capacity
+        self.columns = [[None] * capacity for _ in fields]
+        self.count = 0
+        self.fields = tuple(fields)
+        self.indices = dict((field, index)
+                            for index, field in enumerate(self.fields))
+        self.lock = threading.Lock()
+        self.name = name
+        self.pending = [[None] * capacity for _ in fields]
+        self.pending_count = 0
+
+    def __len__(self):
+        return self.count
+
+    def field(self, name):
+        """
+        Returns the column of delivered values for the specified field.
+
+        Only the first "count" values of the column are valid.
+
+        :param name: The name of the field.
+        :return: The column of values.
+        :raise KeyError: If this channel has no such field.
+        """
+        return self.columns[self.indices[name]]
+
+    def publish(self, *values):
+        """
+        Publishes a single message to this channel, to be delivered at the
+        end of the current frame.
+
+        :param values: The value of each field, in order.
+        :raise ValueError: If the number of values does not match the number
+        of fields.
+        """
+        if len(values) != len(self.fields):
+            raise ValueError("Channel %s expects %d fields but was given %d." %
+                             (self.name, len(self.fields), len(values)))
+
+        with self.lock:
+            index = self.pending_count
+            if index == self.capacity:
+                self._grow()
+            for column, value in zip(self.pending, values):
+                column[index] = value
+            self.pending_count = index + 1
+
+    def swap(self):
+        """
+        Makes the messages published during the current frame available to
+        subscribers and begins collecting messages for the next one.
+        """
+        with self.lock:
+            self.columns, self.pending = self.pending, self.columns
+            self.count = self.pending_count
+            self.pending_count = 0
+
+    def _grow(self):
+        """
+        Doubles the capacity of both of this channel's buffers.
+        """
+        for column in self.columns + self.pending:
+            column.extend([None] * self.capacity)
+        self.capacity *= 2
+
+
+class EventBus:
+    """
+    Represents a collection of channels and the subscribers to them.
+
+    Attributes:
+        channels (dict): The channels associated by name.
+        deliveries (list): The channel and callback of every subscription in
+        delivery order, or None if it must be recomputed.
+        order (list): The names of subsystems in the order their
+        subscriptions should be delivered.
+        subscriptions (list): The channel, callback, and subscriber name of
+        every subscription in the order they were made.
+    """
+
+    def __init__(self):
+        self.channels = dict()
+        self.deliveries = None
+        self.order = []
+        self.subscriptions = []
+
+    def channel(self, name, fields=None, capacity=256):
+        """
+        Returns the channel with the specified name, creating it if it does
+        not exist yet.
+
+        Publishers should keep a reference to the returned channel rather
+        than looking it up every time they publish.
+
+        :param name: The name of the channel.
+        :param fields: The names of the fields of every message; these are
+        only required to create the channel.
+        :param capacity: The initial number of messages the channel can hold
+        per frame.
+        :return: The channel.
+        :raise KeyError: If the channel does not exist and no fields are given.
+        :raise ValueError: If the channel exists with different fields.
+        """
+        channel = self.channels.get(name)
+        if channel is None:
+            if fields is None:
+                raise KeyError("There is no channel named %s." % name)
+            channel = self.channels[name] = Channel(name, fields, capacity)
+        elif fields is not None and tuple(fields) != channel.fields:
+            raise ValueError("Channel %s already exists with fields %s." %
+                             (name, ", ".join(channel.fields)))
+        return channel
+
+    def dispatch(self):
+        """
+        Delivers every message published since the previous dispatch to all
+        subscribers of its channel, one batch per subscription.
+
+        Messages published by subscribers during delivery are delivered at
+        the next dispatch.
+        """
+        for channel in self.channels.values():
+            channel.swap()
+
+        if self.deliveries is None:
+            self.deliveries = self._get_deliveries()
+        for channel, callback in self.deliveries:
+            if channel.count:
+                callback(channel)
+
+    def set_order(self, names):
+        """
+        Sets the order in which subscribers are delivered messages.
+
+        Subscribers whose names are not given are delivered to last.
+
+        :param names: The names of subsystems in delivery order.
+        """
+        self.order = list(names)
+        self.deliveries = None
+
+    def subscribe(self, name, subscriber, callback):
+        """
+        Subscribes the specified callback to the channel with the specified
+        name.
+
+        The callback is given the channel once per frame in which at least
+        one message was published to it.
+
+        :param name: The name of the channel.
+        :param subscriber: The name of the subscribing subsystem.
+        :param callback: The function to deliver messages to.
+        :raise KeyError: If there is no channel with the given name.
+        """
+        self.subscriptions.append((self.channel(name), callback, subscriber))
+        self.deliveries = None
+
+    def unsubscribe(self, name, callback):
+        """
+        Removes every subscription of the specified callback to the channel
+        with the specified name.
+
+        :param name: The name of the channel.
+        :param callback: The callback to remove.
+        """
+        self.subscriptions = [subscription for subscription
+                              in self.subscriptions
+                              if subscription[0].name != name or
+                              subscription[1] != callback]
+        self.deliveries = None
+
+    def _get_deliveries(self):
+        """
+        Sorts every subscription into delivery order.
+
+        :return: A list of channel and callback pairs.
+        """
+        positions = dict((name, index) for index, name in enumerate(self.order))
+        ordered = sorted(self.subscriptions,
+                         key=lambda subscription:
+                         positions.get(subscription[2], len(positions)))
+        return [(channel, callback) for channel, callback, _ in ordered]
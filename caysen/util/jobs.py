@@ -0,0 +1,339 @@
+"""
+Contains a work-stealing job system that lets subsystems split the work of
+a single frame into many small jobs that are executed on a persistent pool
+of worker threads.
+"""
+import logging
+import math
+import os
+import threading
+from collections import deque
+
+
+class JobError(Exception):
+    """
+    Represents an exception that is raised when jobs fail.
+    """
+    pass
+
+
+def _noop():
+    """
+    Does nothing; this is used for jobs that only join others.
+    """
+    pass
+
+
+class Job:
+    """
+    Represents a single unit of work and its place in the dependency graph.
+
+    Attributes:
+        args (tuple): The arguments to call the function with.
+        dependants (list): The jobs that may not start until this one has
+        finished.
+        error (Exception): The exception raised by this job, or by one of its
+        dependencies, or None if there was none.
+        finished (bool): Whether or not this job has finished.
+        function (callable): The function to call.
+        pending (int): The number of dependencies that have not yet finished.
+        result (object): The value returned by the function.
+    """
+
+    __slots__ = ("args", "dependants", "error", "finished", "function",
+                 "pending", "result")
+
+    def __init__(self, function, args):
+        self.args = args
+        self.dependants = []
+        self.error = None
+        self.finished = False
+        self.function = function
+        self.pending = 0
+        self.result = None
+
+
+class JobSystem:
+    """
+    Represents a persistent pool of worker threads that execute jobs.
+
+    Each worker has its own double-ended queue.  Jobs submitted from within a
+    job are pushed onto the current worker's queue and the worker always
+    takes its most recent job first, which keeps related work on the same
+    core; jobs submitted from any other thread are pushed onto a shared
+    queue.  A worker whose own queue is empty takes the oldest job from the
+    shared queue or, failing that, steals the oldest job from another
+    worker.  Threads that wait for jobs to finish execute other jobs in the
+    meantime rather than blocking.
+
+    Because the workers are ordinary threads, jobs only execute truly in
+    parallel while they release the global interpreter lock, as NumPy does
+    for most operations on large arrays and as blocking I/O does.  Jobs
+    should therefore be made large enough that their native work outweighs
+    the cost of scheduling them.
+
+    The worker threads are started when the first job is submitted.
+
+    Attributes:
+        available (threading.Condition): Signaled whenever jobs are queued.
+        completed (threading.Condition): Signaled whenever jobs finish while
+        a thread is waiting.
+        errors (list): The exceptions raised by jobs since the last join.
+        local (threading.local): The index of the queue that belongs to the
+        current thread, if any.
+        lock (threading.Lock): Guards the dependency graph and the counters.
+        outstanding (int): The number of jobs submitted but not yet finished.
+        queues (list): The queue of every worker followed by the shared one.
+        stopping (bool): Whether or not the workers have been asked to exit.
+        threads (list): The worker threads.
+        waiters (int): The number of threads waiting for jobs to finish.
+        workers (int): The number of worker threads.
+    """
+
+    def __init__(self, workers=None):
+        if workers is None:
+            workers = max(1, (os.cpu_count() or 1) - 1)
+        if workers < 1:
+            raise ValueError('There must be at least one worker.')
+
+        self.lock = threading.Lock()
+        self.available = threading.Condition(self.lock)
+        self.completed = threading.Condition(self.lock)
+        self.errors = []
+        self.local = threading.local()
+        self.outstanding = 0
+        self.queues = [deque() for _ in range(workers + 1)]
+        self.stopping = False
+        self.threads = []
+        self.waiters = 0
+        self.workers = workers
+
+    def join(self):
+        """
+        Waits for every job that has been submitted to finish, executing
+        jobs on the calling thread in the meantime.
+
+        :raise JobError: If any job raised an exception since the last join;
+        the first such exception is its cause.
+        """
+        while self.outstanding:
+            if not self._help():
+                with self.lock:
+                    if self.outstanding and not any(self.queues):
+                        self._wait()
+
+        if self.errors:
+            errors, self.errors = self.errors, []
+            raise JobError("%d job(s) failed during the frame." %
+                           len(errors)) from errors[0]
+
+    def parallel_for(self, count, function, grain=None, after=()):
+        """
+        Splits the range of indices from zero to the specified count into
+        contiguous chunks and calls the specified function once per chunk as
+        separate jobs.
+
+        :param count: The number of indices.
+        :param function: The function to call with the start (inclusive) and
+        stop (exclusive) indices of each chunk.
+        :param grain: The number of indices per chunk, or None to create
+        roughly four chunks per worker.
+        :param after: The jobs that must finish before any chunk may start.
+        :return: A job that finishes once every chunk has.
+        """
+        if grain is None:
+            grain = math.ceil(count / (self.workers * 4))
+        grain = max(1, grain)
+
+        chunks = [self.submit(function, start, min(start + grain, count),
+                              after=after)
+                  for start in range(0, count, grain)]
+        return self.submit(_noop, after=chunks)
+
+    def shutdown(self):
+        """
+        Finishes every outstanding job and then stops the worker threads.
+        """
+        try:
+            self.join()
+        except JobError:
+            logging.exception("Jobs failed before the job system was "
+                              "shutdown.")
+
+        with self.lock:
+            self.stopping = True
+            self.available.notify_all()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        self.stopping = False
+
+    def submit(self, function, *args, after=()):
+        """
+        Submits a job that calls the specified function with the specified
+        arguments once all of the specified jobs have finished.
+
+        If any of those jobs fails, this job is not executed and fails with
+        the same exception.
+
+        :param function: The function to call.
+        :param args: The arguments to call the function with.
+        :param after: The jobs that must finish before this one may start.
+        :return: The new job.
+        """
+        job = Job(function, args)
+        with self.lock:
+            if not self.threads:
+                self._start()
+
+            self.outstanding += 1
+            for dependency in after:
+                if not dependency.finished:
+                    dependency.dependants.append(job)
+                    job.pending += 1
+                elif dependency.error is not None and job.error is None:
+                    job.error = dependency.error
+            if job.pending == 0:
+                self._push(job)
+        return job
+
+    def wait(self, job):
+        """
+        Waits for the specified job to finish, executing other jobs on the
+        calling thread in the meantime.
+
+        :param job: The job to wait for.
+        :return: The value returned by the job's function.
+        :raise Exception: The exception raised by the job, if any.
+        """
+        while not job.finished:
+            if not self._help():
+                with self.lock:
+                    if not job.finished and not any(self.queues):
+                        self._wait()
+
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _finish(self, job):
+        """
+        Marks the specified job as finished and queues every dependant that
+        is now ready.
+
+        :param job: The job that finished.
+        """
+        with self.lock:
+            job.finished = True
+            for dependant in job.dependants:
+                if job.error is not None and dependant.error is None:
+                    dependant.error = job.error
+                dependant.pending -= 1
+                if dependant.pending == 0:
+                    self._push(dependant)
+            job.dependants = None
+
+            self.outstanding -= 1
+            if self.waiters:
+                self.completed.notify_all()
+
+    def _help(self):
+        """
+        Executes a single queued job on the calling thread, if there is one.
+
+        :return: Whether or not a job was executed.
+        """
+        job = self._take(getattr(self.local, "index", self.workers))
+        if job is None:
+            return False
+        self._run(job)
+        return True
+
+    def _push(self, job):
+        """
+        Queues the specified job on the current thread's queue; this must be
+        called with the lock held.
+
+        :param job: The job to queue.
+        """
+        self.queues[getattr(self.local, "index", self.workers)].append(job)
+        self.available.notify()
+
+    def _run(self, job):
+        """
+        Executes the specified job, unless one of its dependencies failed,
+        and then finishes it.
+
+        :param job: The job to execute.
+        """
+        if job.error is None:
+            try:
+                job.result = job.function(*job.args)
+            except Exception as error:
+                job.error = error
+                self.errors.append(error)
+        self._finish(job)
+
+    def _start(self):
+        """
+        Starts the worker threads.
+        """
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, args=(index,),
+                                      name="jobs-%d" % index, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def _take(self, index):
+        """
+        Takes the next job for the queue with the specified index: its own
+        most recent job, the oldest shared job, or the oldest job stolen from
+        another worker, in that order.
+
+        :param index: The index of the queue to take from.
+        :return: The job, or None if every queue is empty.
+        """
+        queues = self.queues
+        try:
+            if index < self.workers:
+                return queues[index].pop()
+            return queues[index].popleft()
+        except IndexError:
+            pass
+
+        count = len(queues)
+        for offset in range(1, count):
+            try:
+                return queues[(index + offset) % count].popleft()
+            except IndexError:
+                continue
+        return None
+
+    def _wait(self):
+        """
+        Blocks until a job finishes or is queued; this must be called with
+        the lock held.
+        """
+        self.waiters += 1
+        self.completed.wait()
+        self.waiters -= 1
+
+    def _work(self, index):
+        """
+        Executes jobs until the job system is shutdown.
+
+        :param index: The index of the worker's own queue.
+        """
+        self.local.index = index
+        while True:
+            job = self._take(index)
+            if job is not None:
+                self._run(job)
+                continue
+
+            with self.lock:
+                if self.stopping:
+                    return
+                if not any(self.queues):
+                    self.available.wait()
+
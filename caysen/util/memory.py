@@ -0,0 +1,326 @@
+"""
+Contains a mechanism for attributing memory allocations to subsystems and
+game states using tracemalloc, in order to find the source of memory that
+creeps upwards over long sessions.
+
+Game states and other code may attribute their own allocations by using the
+module-level "track" function, which does nothing unless a tracker has been
+made active:
+
+    with memory.track("village"):
+        ...
+"""
+import contextvars
+import linecache
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+_NULL_TRACK = nullcontext()
+
+_tracker = None
+
+
+def get_tracker():
+    """
+    Returns the currently active allocation tracker.
+
+    :return: The active tracker, or None if tracking is disabled.
+    """
+    return _tracker
+
+
+def set_tracker(tracker):
+    """
+    Sets the currently active allocation tracker that receives the regions
+    created with the "track" function.
+
+    :param tracker: The tracker to use, or None to disable tracking.
+    """
+    global _tracker
+    _tracker = tracker
+
+
+def track(name, category="user"):
+    """
+    Creates a context manager that attributes the allocations made by the
+    enclosed code to the specified name on the active tracker, if any.
+
+    :param name: The name to attribute allocations to.
+    :param category: The category of the name.
+    :return: A context manager.
+    """
+    if _tracker is None or not _tracker.is_sampling:
+        return _NULL_TRACK
+    return _tracker.track("%s:%s" % (category, name))
+
+
+def _format_site(traceback):
+    """
+    Formats the most recent frame of the specified traceback as a single
+    line.
+
+    :param traceback: The traceback to format.
+    :return: The formatted frame.
+    """
+    frame = traceback[0]
+    line = linecache.getline(frame.filename, frame.lineno).strip()
+    return "%s:%d: %s" % (frame.filename, frame.lineno, line)
+
+
+def _get_differences(snapshot, before, limit):
+    """
+    Compares the specified snapshots by source line, ignoring the memory
+    used by tracemalloc itself and by this module.
+
+    Filtering the results rather than the snapshots is considerably faster,
+    since snapshots contain every traced block.
+
+    :param snapshot: The later snapshot.
+    :param before: The earlier snapshot.
+    :param limit: The maximum number of differences to return.
+    :return: A list of statistic differences, largest first.
+    """
+    ignored = (tracemalloc.__file__, __file__, linecache.__file__,
+               "<unknown>")
+    differences = []
+    for diff in snapshot.compare_to(before, "lineno"):
+        if diff.size_diff and diff.traceback[0].filename not in ignored:
+            differences.append(diff)
+            if len(differences) == limit:
+                break
+    return differences
+
+
+class Usage:
+    """
+    Represents the allocations attributed to a single name.
+
+    Attributes:
+        net (int): The total number of bytes allocated but not freed during
+        every sampled region.
+        peak (int): The largest number of bytes in use at once during any
+        sampled region, above the amount in use when it began.
+        samples (int): The number of sampled regions.
+        sites (dict): The net number of bytes allocated by each source line
+        during the regions bracketed by snapshots, associated by its
+        formatted location.
+    """
+
+    def __init__(self):
+        self.net = 0
+        self.peak = 0
+        self.samples = 0
+        self.sites = dict()
+
+
+class AllocationTracker:
+    """
+    Represents a mechanism for sampling the memory allocated by named
+    regions of code, such as subsystem updates, at a fixed cadence.
+
+    On every sampled frame, each tracked region is measured with the
+    tracemalloc counters, which is cheap enough to do regularly.  On some of
+    those frames, each region is also bracketed by a pair of snapshots whose
+    difference attributes its net allocations to source lines; this takes a
+    noticeable amount of time in a large process and so is done far less
+    often.  Nested regions are attributed to every enclosing region as well
+    as their own.
+
+    Each thread, and each asyncio task, keeps its own stack of regions, so
+    regions may be sampled on the kernel's worker threads and in coroutines
+    as well as on its own thread.  Because tracemalloc measures the whole
+    process, however, allocations made elsewhere while a region is sampled
+    are attributed to it too, so the regions of subsystems updated
+    concurrently include one another's allocations.
+
+    Attributes:
+        baseline (tracemalloc.Snapshot): The snapshot taken when tracking
+        started, which the final report is compared against.
+        depth (int): The number of frames stored in each traceback.
+        frames (int): The number of frames that have begun.
+        interval (int): The number of frames between each sampled frame.
+        is_sampling (bool): Whether or not the current frame is sampled.
+        is_snapshotting (bool): Whether or not regions in the current frame
+        are bracketed by snapshots.
+        limit (int): The number of allocation sites to keep per region.
+        lock (threading.Lock): Guards the usages.
+        path (str): The path of the report file.
+        regions (contextvars.ContextVar): Holds the name, starting snapshot
+        (if any), starting memory usage, and peak memory usage so far of
+        every region the current thread or task is sampling, innermost last.
+        snapshot_interval (int): The number of sampled frames between each
+        frame whose regions are bracketed by snapshots, or zero to never take
+        snapshots around regions.
+        start_time (float): The time at which tracking started.
+        usages (dict): The usage attributed to each region associated by
+        name.
+        was_tracing (bool): Whether or not tracemalloc was already tracing
+        when this tracker started.
+    """
+
+    def __init__(self, path, interval=60, snapshot_interval=10, depth=1,
+                 limit=10):
+        if interval < 1:
+            raise ValueError('The interval must be at least one frame.')
+        if snapshot_interval < 0:
+            raise ValueError('The snapshot interval must not be negative.')
+
+        self.baseline = None
+        self.depth = depth
+        self.frames = 0
+        self.interval = interval
+        self.is_sampling = False
+        self.is_snapshotting = False
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.path = path
+        # The stacks are immutable so that a task's copy of the context
+        # never shares one with the code that started it.
+        self.regions = contextvars.ContextVar("regions", default=())
+        self.snapshot_interval = snapshot_interval
+        self.start_time = 0.0
+        self.usages = dict()
+        self.was_tracing = False
+
+    def begin_frame(self):
+        """
+        Begins a new frame and determines whether or not it is sampled.
+        """
+        self.frames += 1
+        self.is_sampling = self.frames % self.interval == 0
+        self.is_snapshotting = self.is_sampling and \
+            0 < self.snapshot_interval and \
+            self.frames % (self.interval * self.snapshot_interval) == 0
+
+    def enter(self, name):
+        """
+        Begins sampling a region with the specified name.
+
+        :param name: The name to attribute allocations to.
+        """
+        # The snapshot is taken first so that the memory it occupies is
+        # already in use when the region's usage is measured.
+        snapshot = tracemalloc.take_snapshot() if self.is_snapshotting \
+            else None
+        current, peak = tracemalloc.get_traced_memory()
+        regions = self.regions.get()
+        if regions:
+            outer = regions[-1]
+            outer[3] = max(outer[3], peak)
+        tracemalloc.reset_peak()
+        self.regions.set(regions + ([name, snapshot, current, current],))
+
+    def exit(self):
+        """
+        Finishes sampling the innermost region and attributes its
+        allocations.
+        """
+        current, peak = tracemalloc.get_traced_memory()
+        regions = self.regions.get()
+        name, before, start, earlier_peak = regions[-1]
+        regions = regions[:-1]
+        self.regions.set(regions)
+        peak = max(peak, earlier_peak)
+        if regions:
+            outer = regions[-1]
+            outer[3] = max(outer[3], peak)
+
+        differences = []
+        if before is not None:
+            differences = _get_differences(tracemalloc.take_snapshot(),
+                                           before, self.limit)
+
+        with self.lock:
+            usage = self.usages.get(name)
+            if usage is None:
+                usage = self.usages[name] = Usage()
+            usage.net += current - start
+            usage.peak = max(usage.peak, peak - start)
+            usage.samples += 1
+            for diff in differences:
+                site = _format_site(diff.traceback)
+                usage.sites[site] = usage.sites.get(site, 0) + diff.size_diff
+
+    def start(self):
+        """
+        Begins tracing allocations and takes the baseline snapshot.
+        """
+        self.was_tracing = tracemalloc.is_tracing()
+        if not self.was_tracing:
+            tracemalloc.start(self.depth)
+        self.baseline = tracemalloc.take_snapshot()
+        self.start_time = time.perf_counter()
+
+    def stop(self):
+        """
+        Writes the report and stops tracing allocations, unless tracemalloc
+        was already tracing beforehand.
+        """
+        if self.baseline is None:
+            return
+
+        self.write_report()
+        self.baseline = None
+        if not self.was_tracing:
+            tracemalloc.stop()
+
+    @contextmanager
+    def track(self, name):
+        """
+        Creates a context in which allocations are attributed to the
+        specified name.
+
+        :param name: The name to attribute allocations to.
+        """
+        self.enter(name)
+        try:
+            yield
+        finally:
+            self.exit()
+
+    def write_report(self):
+        """
+        Writes the usage attributed to every region, followed by the
+        difference between the current allocations and the baseline, to the
+        report file.
+        """
+        final = tracemalloc.take_snapshot()
+        elapsed = time.perf_counter() - self.start_time
+        current, _ = tracemalloc.get_traced_memory()
+
+        lines = ["Allocation report after %d frames (%.1f s); %d frames "
+                 "sampled." % (self.frames, elapsed,
+                               self.frames // self.interval),
+                 "Currently traced: %.1f KiB." % (current / 1024.0),
+                 "",
+                 "%-32s %8s %14s %14s %12s" % ("region", "samples",
+                                                "net KiB", "KiB/sample",
+                                                "peak KiB")]
+        with self.lock:
+            ordered = sorted(self.usages.items(),
+                             key=lambda item: item[1].net, reverse=True)
+        for name, usage in ordered:
+            lines.append("%-32s %8d %14.1f %14.3f %12.1f" %
+                         (name, usage.samples, usage.net / 1024.0,
+                          usage.net / 1024.0 / usage.samples,
+                          usage.peak / 1024.0))
+
+        for name, usage in ordered:
+            sites = sorted(usage.sites.items(), key=lambda item: item[1],
+                           reverse=True)[:self.limit]
+            if not sites:
+                continue
+            lines.extend(["", "Top allocation sites in %s:" % name])
+            lines.extend("  %+12.1f KiB  %s" % (size / 1024.0, site)
+                         for site, size in sites)
+
+        lines.extend(["", "Largest differences since tracking started:"])
+        for diff in _get_differences(final, self.baseline, self.limit * 2):
+            lines.append("  %+12.1f KiB  %+8d blocks  %s" %
+                         (diff.size_diff / 1024.0, diff.count_diff,
+                          _format_site(diff.traceback)))
+
+        with open(self.path, "w") as file:
+            file.write("\n".join(lines) + "\n")
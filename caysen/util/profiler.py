@@ -0,0 +1,200 @@
+"""
+Contains a statistical profiler that may be started and stopped while the
+game is running and that writes its samples as collapsed stacks, the input
+format of flame graph tools such as flamegraph.pl and speedscope.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class SamplingProfiler:
+    """
+    Represents a mechanism for periodically sampling the call stack of every
+    thread, such as the kernel's and those of its job workers, for a fixed
+    number of frames.
+
+    Samples are taken on a background thread that only exists while the
+    profiler is running, so the profiler costs nothing while it is stopped.
+    While it is running, each sample briefly holds the global interpreter
+    lock in order to walk every thread's stack.
+
+    Each run is written to its own file, numbered from one, whose lines each
+    contain a stack (the thread's name followed by every function from the
+    outermost inwards, separated by semicolons) and the number of times it
+    was sampled.
+
+    Attributes:
+        frames (int): The number of frames that have ended during the
+        current run.
+        interval (float): The amount of time in seconds between samples.
+        labels (dict): The label of each code object that has been sampled,
+        associated by code object.
+        length (int): The number of frames each run lasts, or zero to run
+        until stopped.
+        lock (threading.Lock): Guards the stacks.
+        path (str): The path of the output files, to which each run's number
+        is added before the extension.
+        runs (int): The number of runs that have been started.
+        samples (int): The number of samples taken during the current run.
+        stacks (Counter): The number of times each collapsed stack has been
+        sampled during the current run.
+        start_time (float): The time at which the current run started.
+        stopping (threading.Event): Signals the sampling thread to exit.
+        thread (threading.Thread): The sampling thread, or None if the
+        profiler is stopped.
+    """
+
+    def __init__(self, path, interval=0.005, length=600):
+        if interval <= 0:
+            raise ValueError('The sampling interval must be positive.')
+        if length < 0:
+            raise ValueError('The number of frames must not be negative.')
+
+        self.frames = 0
+        self.interval = interval
+        self.labels = dict()
+        self.length = length
+        self.lock = threading.Lock()
+        self.path = path
+        self.runs = 0
+        self.samples = 0
+        self.stacks = Counter()
+        self.start_time = 0.0
+        self.stopping = threading.Event()
+        self.thread = None
+
+    @property
+    def is_running(self):
+        """
+        Returns whether or not the profiler is currently sampling.
+
+        :return: Whether or not a run is in progress.
+        """
+        return self.thread is not None
+
+    def end_frame(self):
+        """
+        Counts a frame towards the current run and stops the profiler once
+        the run has lasted for its number of frames.
+        """
+        self.frames += 1
+        if 0 < self.length <= self.frames:
+            self.stop()
+
+    def get_output_path(self, run):
+        """
+        Returns the path of the file the specified run is written to.
+
+        :param run: The number of the run.
+        :return: The path of the run's output file.
+        """
+        root, extension = os.path.splitext(self.path)
+        return "%s-%d%s" % (root, run, extension)
+
+    def start(self):
+        """
+        Begins a new run and starts sampling.
+        """
+        if self.is_running:
+            return
+
+        self.frames = 0
+        self.runs += 1
+        self.samples = 0
+        self.stacks = Counter()
+        self.start_time = time.perf_counter()
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._sample,
+                                       name="profiler", daemon=True)
+        self.thread.start()
+        logging.info("Started sampling profiler run %d." % self.runs)
+
+    def stop(self):
+        """
+        Stops sampling and writes the current run to its output file.
+        """
+        if not self.is_running:
+            return
+
+        self.stopping.set()
+        self.thread.join()
+        self.thread = None
+
+        path = self.get_output_path(self.runs)
+        self.write(path)
+        logging.info("Wrote %d samples over %d frames (%.1f s) to %s." %
+                     (self.samples, self.frames,
+                      time.perf_counter() - self.start_time, path))
+
+    def toggle(self):
+        """
+        Stops the profiler if it is running and starts it otherwise.
+
+        :return: Whether or not the profiler is now running.
+        """
+        if self.is_running:
+            self.stop()
+        else:
+            self.start()
+        return self.is_running
+
+    def write(self, path):
+        """
+        Writes the stacks sampled during the current run to the specified
+        file in the collapsed stack format.
+
+        :param path: The path of the file to write.
+        """
+        with self.lock:
+            stacks = sorted(self.stacks.items())
+        with open(path, "w") as file:
+            for stack, count in stacks:
+                file.write("%s %d\n" % (stack, count))
+
+    def _collapse(self, name, frame):
+        """
+        Converts the stack ending at the specified frame into a single line.
+
+        :param name: The name of the thread the stack belongs to.
+        :param frame: The innermost frame of the stack.
+        :return: The collapsed stack.
+        """
+        labels = self.labels
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            label = labels.get(code)
+            if label is None:
+                label = labels[code] = "%s (%s:%d)" % (
+                    code.co_name, code.co_filename,
+                    code.co_firstlineno)
+            stack.append(label)
+            frame = frame.f_back
+        stack.append(name)
+        stack.reverse()
+        return ";".join(stack)
+
+    def _sample(self):
+        """
+        Samples the stack of every other thread once per interval until the
+        profiler is stopped.
+        """
+        own_id = threading.get_ident()
+        names = dict()
+        while not self.stopping.wait(self.interval):
+            frames = sys._current_frames()
+            if any(ident not in names for ident in frames):
+                names = dict((thread.ident, thread.name)
+                             for thread in threading.enumerate())
+
+            stacks = [self._collapse(names.get(ident, str(ident)), frame)
+                      for ident, frame in frames.items() if ident != own_id]
+            del frames
+
+            with self.lock:
+                self.stacks.update(stacks)
+                self.samples += 1
@@ -0,0 +1,212 @@
+"""
+Contains classes for recording a kernel session to a compact binary log and
+replaying it deterministically.
+
+A session log begins with a header containing the random seed that the
+session was started with, followed by one record per frame.  Each frame
+record holds the frame's delta time and the input events that were consumed
+during that frame:
+
+    header: magic (7 bytes), seed (uint64)
+    frame:  delta time (float64), event count (uint16), events...
+    event:  length (uint16), UTF-8 JSON [type, attributes] pair
+
+Replaying the same delta times, events, and seed through the same kernel
+reproduces the session exactly, provided the kernel executes serially.
+"""
+import json
+import random
+import struct
+
+_MAGIC = b"CAYSEN\x02"
+
+_HEADER = struct.Struct("<Q")
+
+_FRAME = struct.Struct("<dH")
+
+_EVENT = struct.Struct("<H")
+
+_SIMPLE_TYPES = (bool, int, float, str, tuple, type(None))
+
+
+def _to_tuples(value):
+    """
+    Converts every list in the specified decoded JSON value back into the
+    tuple it was recorded as.
+
+    :param value: The value to convert.
+    :return: The converted value.
+    """
+    if isinstance(value, list):
+        return tuple(_to_tuples(item) for item in value)
+    if isinstance(value, dict):
+        return dict((key, _to_tuples(item)) for key, item in value.items())
+    return value
+
+
+def seed_all(seed):
+    """
+    Seeds every random number generator used by this project.
+
+    :param seed: The seed to use.
+    """
+    import numpy as np
+
+    random.seed(seed)
+    np.random.seed(seed % 2 ** 32)
+
+
+class ReplayEvent:
+    """
+    Represents an input event that was read from a session log.
+
+    Replayed events carry the same attributes as the TDL events they were
+    recorded from, so input handling code cannot tell them apart.
+
+    Attributes:
+        type (str): The type of event, e.g. "KEYDOWN" or "QUIT".
+    """
+
+    def __init__(self, type, attributes):
+        self.__dict__.update(attributes)
+        self.type = type
+
+
+class SessionRecorder:
+    """
+    Represents a mechanism for writing a kernel session to a log.
+
+    Because events are consumed part way through a frame, each frame is
+    only written once the next one begins (or the recorder is closed).
+
+    Attributes:
+        delta_time (float): The delta time of the current frame, or None if
+        no frame has begun.
+        events (list): The encoded events consumed during the current frame.
+        file (io.BufferedWriter): The session log.
+        seed (int): The random seed the session was started with.
+    """
+
+    def __init__(self, path, seed):
+        self.delta_time = None
+        self.events = []
+        self.file = open(path, "wb")
+        self.file.write(_MAGIC + _HEADER.pack(seed))
+        self.seed = seed
+
+    def close(self):
+        """
+        Writes the current frame and closes the session log.
+        """
+        self._flush()
+        self.file.close()
+
+    def write_events(self, events):
+        """
+        Records the specified input events as having been consumed during
+        the current frame.
+
+        :param events: The events to record.
+        """
+        for event in events:
+            attributes = dict((key, value) for key, value in
+                              getattr(event, "__dict__", {}).items()
+                              if isinstance(value, _SIMPLE_TYPES))
+            attributes.pop("type", None)
+            self.events.append(json.dumps(
+                [event.type, attributes],
+                separators=(",", ":")).encode("utf-8"))
+
+    def write_frame(self, delta_time):
+        """
+        Records the start of a new frame with the specified delta time,
+        writing the previous frame to the log.
+
+        :param delta_time: The frame's delta time in seconds.
+        """
+        self._flush()
+        self.delta_time = delta_time
+
+    def _flush(self):
+        """
+        Writes the current frame and its events, if any, to the log.
+        """
+        if self.delta_time is None:
+            return
+
+        self.file.write(_FRAME.pack(self.delta_time, len(self.events)))
+        for data in self.events:
+            self.file.write(_EVENT.pack(len(data)))
+            self.file.write(data)
+        self.delta_time = None
+        self.events.clear()
+
+
+class SessionReplay:
+    """
+    Represents a mechanism for reading back a kernel session from a log.
+
+    The entire log is decoded up front so that replaying it involves no I/O.
+
+    Attributes:
+        events (list): The events consumed during the current frame.
+        frames (list): The delta time and list of events for each frame.
+        index (int): The index of the next frame to replay.
+        seed (int): The random seed the session was started with.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            data = file.read()
+
+        if not data.startswith(_MAGIC):
+            raise ValueError("%s is not a session log." % path)
+
+        offset = len(_MAGIC)
+        self.seed, = _HEADER.unpack_from(data, offset)
+        offset += _HEADER.size
+
+        self.events = []
+        self.frames = []
+        self.index = 0
+
+        while offset < len(data):
+            delta_time, count = _FRAME.unpack_from(data, offset)
+            offset += _FRAME.size
+
+            events = []
+            for _ in range(count):
+                length, = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                type, attributes = json.loads(
+                    data[offset:offset + length].decode("utf-8"))
+                events.append(ReplayEvent(type, _to_tuples(attributes)))
+                offset += length
+
+            self.frames.append((delta_time, events))
+
+    def read_events(self):
+        """
+        Returns the input events that were consumed during the current frame.
+
+        Events are only returned once; subsequent calls during the same frame
+        return an empty list.
+
+        :return: A list of events.
+        """
+        events, self.events = self.events, []
+        return events
+
+    def read_frame(self):
+        """
+        Advances to the next frame.
+
+        :return: The frame's delta time in seconds, or None if there are no
+        more frames.
+        """
+        if self.index >= len(self.frames):
+            return None
+
+        delta_time, self.events = self.frames[self.index]
+        self.index += 1
+        return delta_time
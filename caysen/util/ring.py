@@ -0,0 +1,166 @@
+"""
+Contains a single-producer, single-consumer ring buffer of variable length
+messages held in shared memory, so that two processes may exchange messages
+without copying them through a pipe.
+"""
+import os
+import struct
+import time
+from multiprocessing import shared_memory
+
+_COUNTER = struct.Struct("Q")
+
+_LENGTH = struct.Struct("I")
+
+# The write and read counters are kept on separate cache lines so that the
+# producer and consumer do not contend for the same line.
+_WRITTEN = 0
+
+_READ = 64
+
+_HEADER = 128
+
+
+class SharedRingBuffer:
+    """
+    Represents a circular buffer of messages in a block of shared memory
+    that one process writes and another reads.
+
+    Each message is stored as its length followed by its bytes, wrapping
+    around the end of the buffer as necessary.  The buffer's header holds the
+    total number of bytes ever written and read; since only the producer
+    advances the former and only the consumer the latter, no lock is needed.
+
+    The buffer itself never blocks.  Consumers are woken by a semaphore that
+    the producer releases once per message, so that waiting for a message
+    costs nothing while it is idle.
+
+    Attributes:
+        capacity (int): The number of bytes of messages the buffer can hold.
+        memory (SharedMemory): The shared block holding the header and the
+        messages.
+        owner (int): The identifier of the process that created the shared
+        block and must therefore destroy it, or None if it was attached by
+        name.
+        signal (Semaphore): Released once for every message written.
+        view (memoryview): A view of the shared block.
+    """
+
+    def __init__(self, signal, capacity=1 << 20, name=None):
+        if name is None:
+            if capacity < _LENGTH.size + 1:
+                raise ValueError('The capacity is too small to hold any '
+                                 'message.')
+            self.memory = shared_memory.SharedMemory(
+                create=True, size=_HEADER + capacity)
+            self.memory.buf[:_HEADER] = bytes(_HEADER)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+
+        self.capacity = capacity
+        self.owner = os.getpid() if name is None else None
+        self.signal = signal
+        self.view = self.memory.buf
+
+    def __getstate__(self):
+        # The shared block is attached anew by name in the other process.
+        return {"capacity": self.capacity, "name": self.memory.name,
+                "signal": self.signal}
+
+    def __setstate__(self, state):
+        self.__init__(state["signal"], state["capacity"], state["name"])
+
+    def close(self):
+        """
+        Detaches this process from the shared block, destroying it if this
+        process created it.
+        """
+        if self.view is None:
+            return
+
+        self.view.release()
+        self.view = None
+        self.memory.close()
+        # A forked child inherits this object without pickling it, so the
+        # creator is recognized by its process rather than by a flag.
+        if self.owner == os.getpid():
+            self.memory.unlink()
+
+    def read(self, timeout=None):
+        """
+        Removes the oldest message from this buffer, waiting for one to be
+        written if there are none.
+
+        :param timeout: The maximum amount of time in seconds to wait, or
+        None to wait forever.
+        :return: The message as bytes, or None if the timeout expired.
+        """
+        if not self.signal.acquire(timeout=timeout):
+            return None
+
+        read = _COUNTER.unpack_from(self.view, _READ)[0]
+        length = _LENGTH.unpack(self._copy_out(read, _LENGTH.size))[0]
+        message = self._copy_out(read + _LENGTH.size, length)
+        _COUNTER.pack_into(self.view, _READ, read + _LENGTH.size + length)
+        return message
+
+    def write(self, message, timeout=None):
+        """
+        Appends the specified message to this buffer, waiting for the
+        consumer to make room if it is full.
+
+        :param message: The bytes to write.
+        :param timeout: The maximum amount of time in seconds to wait for
+        room, or None to wait forever.
+        :raise TimeoutError: If the buffer stayed full for the whole timeout.
+        :raise ValueError: If the message could never fit in the buffer.
+        """
+        size = _LENGTH.size + len(message)
+        if size > self.capacity:
+            raise ValueError("A message of %d bytes cannot fit in a buffer of "
+                             "%d bytes." % (len(message), self.capacity))
+
+        written = _COUNTER.unpack_from(self.view, _WRITTEN)[0]
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        delay = 0.0
+        while written + size - _COUNTER.unpack_from(self.view, _READ)[0] > \
+                self.capacity:
+            if deadline is not None and time.perf_counter() >= deadline:
+                raise TimeoutError('The ring buffer stayed full.')
+            time.sleep(delay)
+            delay = min(0.001, delay * 2 or 0.00001)
+
+        self._copy_in(written, _LENGTH.pack(len(message)))
+        self._copy_in(written + _LENGTH.size, message)
+        _COUNTER.pack_into(self.view, _WRITTEN, written + size)
+        self.signal.release()
+
+    def _copy_in(self, position, data):
+        """
+        Copies the specified bytes into the buffer at the specified position,
+        wrapping around its end if necessary.
+
+        :param position: The total number of bytes written before the data.
+        :param data: The bytes to copy.
+        """
+        start = position % self.capacity
+        first = min(len(data), self.capacity - start)
+        self.view[_HEADER + start:_HEADER + start + first] = data[:first]
+        if first < len(data):
+            self.view[_HEADER:_HEADER + len(data) - first] = data[first:]
+
+    def _copy_out(self, position, length):
+        """
+        Copies the specified number of bytes out of the buffer from the
+        specified position, wrapping around its end if necessary.
+
+        :param position: The total number of bytes read before the data.
+        :param length: The number of bytes to copy.
+        :return: The bytes.
+        """
+        start = position % self.capacity
+        first = min(length, self.capacity - start)
+        data = bytes(self.view[_HEADER + start:_HEADER + start + first])
+        if first < length:
+            data += bytes(self.view[_HEADER:_HEADER + length - first])
+        return data
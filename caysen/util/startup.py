@@ -0,0 +1,83 @@
+"""
+Contains a mechanism for measuring how long it takes to import each module
+while the application starts.
+"""
+import builtins
+import sys
+import time
+
+
+class ImportTimer:
+    """
+    Represents a context in which the first import of every module is timed.
+
+    For each module, both its cumulative time, which includes the time spent
+    importing everything it imports in turn, and its self time, which does
+    not, are recorded.  Modules that were already imported when the context
+    was entered are not timed.
+
+    Attributes:
+        original (callable): The import function that was replaced, or None
+        if this timer is not active.
+        stack (list): The time spent importing children of each module that
+        is currently being imported.
+        times (dict): The self and cumulative time in seconds of each module
+        associated by name, in the order that the imports finished.
+    """
+
+    def __init__(self):
+        self.original = None
+        self.stack = []
+        self.times = dict()
+
+    def __enter__(self):
+        self.original = builtins.__import__
+        builtins.__import__ = self._import
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        builtins.__import__ = self.original
+        self.original = None
+
+    def report(self, limit=15):
+        """
+        Creates a summary of the slowest imports, by cumulative time.
+
+        :param limit: The maximum number of modules to include.
+        :return: The summary as a multi-line string.
+        """
+        slowest = sorted(self.times.items(), key=lambda item: item[1][1],
+                         reverse=True)[:limit]
+        lines = ["%-40s %10s %10s" % ("module", "self ms", "total ms")]
+        for name, (own, total) in slowest:
+            lines.append("%-40s %10.3f %10.3f" %
+                         (name, own * 1000.0, total * 1000.0))
+        return "\n".join(lines)
+
+    def total(self):
+        """
+        Computes the time spent importing every timed module.
+
+        :return: The total time in seconds.
+        """
+        return sum(own for own, _ in self.times.values())
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        """
+        Imports a module with the original import function, timing it if it
+        has not been imported yet.
+        """
+        if level != 0 or name in sys.modules:
+            return self.original(name, globals, locals, fromlist, level)
+
+        self.stack.append(0.0)
+        start_time = time.perf_counter()
+        try:
+            return self.original(name, globals, locals, fromlist, level)
+        finally:
+            total = time.perf_counter() - start_time
+            children = self.stack.pop()
+            if self.stack:
+                self.stack[-1] += total
+            if name in sys.modules and name not in self.times:
+                self.times[name] = (total - children, total)
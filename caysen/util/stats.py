@@ -0,0 +1,194 @@
+"""
+Contains classes for collecting timing samples over a rolling window and
+summarizing them, primarily for profiling the kernel and its subsystems.
+"""
+import math
+from array import array
+
+
+class RingBuffer:
+    """
+    Represents a fixed-size collection of floating point samples that
+    overwrites the oldest sample once it is full.
+
+    Because the backing storage is allocated up front, appending a sample
+    never allocates memory.
+
+    Attributes:
+        count (int): The number of valid samples in the buffer.
+        index (int): The position at which the next sample will be stored.
+        samples (array): The backing storage.
+        total (int): The number of samples ever added to the buffer since it
+        was last cleared.
+    """
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError('The capacity must be at least one.')
+
+        self.count = 0
+        self.index = 0
+        self.samples = array('d', bytes(8 * capacity))
+        self.total = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value):
+        """
+        Adds the specified sample to this buffer, replacing the oldest sample
+        if the buffer is full.
+
+        :param value: The sample to add.
+        """
+        self.samples[self.index] = value
+        self.index = (self.index + 1) % len(self.samples)
+        self.total += 1
+        if self.count < len(self.samples):
+            self.count += 1
+
+    def clear(self):
+        """
+        Removes all of the samples from this buffer.
+        """
+        self.count = self.index = self.total = 0
+
+    def values(self, recent=None):
+        """
+        Returns a copy of the valid samples in this buffer, or of only the
+        most recent of them, in no particular order.
+
+        :param recent: The number of most recent samples to return, or None
+        to return every valid sample.
+        :return: A list of samples.
+        """
+        if recent is None or recent >= self.count:
+            return self.samples[:self.count].tolist()
+        if recent <= 0:
+            return []
+        if recent <= self.index:
+            return self.samples[self.index - recent:self.index].tolist()
+        return self.samples[:self.index].tolist() + \
+            self.samples[self.index - recent:].tolist()
+
+
+def _percentile(ordered, fraction):
+    """
+    Returns the sample at the specified fraction of the specified sorted
+    samples using the nearest-rank method.
+
+    :param ordered: A non-empty list of samples sorted in ascending order.
+    :param fraction: The percentile as a fraction between zero and one.
+    :return: The sample at that percentile.
+    """
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+class FrameStats:
+    """
+    Represents a collection of rolling timing statistics, each associated
+    with a name, such as that of a subsystem.
+
+    Attributes:
+        buffers (dict): A ring buffer of durations in seconds associated by
+        name.
+        capacity (int): The number of samples kept for each name.
+    """
+
+    def __init__(self, capacity=300):
+        self.buffers = dict()
+        self.capacity = capacity
+
+    def record(self, name, duration):
+        """
+        Records a single duration for the specified name.
+
+        :param name: The name to record the duration for.
+        :param duration: The duration in seconds.
+        """
+        buffer = self.buffers.get(name)
+        if buffer is None:
+            buffer = self.buffers[name] = RingBuffer(self.capacity)
+        buffer.append(duration)
+
+    def reset(self, names=()):
+        """
+        Discards all recorded durations and prepares empty buffers for each
+        of the specified names.
+
+        Preparing buffers up front ensures that recording from multiple
+        threads never has to modify the dictionary of buffers.
+
+        :param names: The names to prepare buffers for.
+        """
+        self.buffers = dict((name, RingBuffer(self.capacity))
+                            for name in names)
+
+    def mark(self):
+        """
+        Returns the number of durations recorded so far for every name, so
+        that only those recorded afterwards may later be summarized.
+
+        :return: A dictionary of counts associated by name.
+        """
+        return dict((name, buffer.total)
+                    for name, buffer in self.buffers.items())
+
+    def summary(self, name, since=0):
+        """
+        Computes a summary of the durations recorded for the specified name.
+
+        The summary contains the number of samples ("count") as well as the
+        "mean", "p50", "p95", "p99", and "max" durations, all in seconds.
+        Only the durations that are still within the rolling window are
+        summarized.
+
+        :param name: The name to summarize.
+        :param since: The number of durations recorded for the name, as
+        returned by "mark", before those to summarize.
+        :return: A dictionary of statistics, or None if there are no samples.
+        :raise KeyError: If nothing has been recorded for the name.
+        """
+        buffer = self.buffers[name]
+        ordered = sorted(buffer.values(buffer.total - since))
+        if not ordered:
+            return None
+        return {"count": len(ordered),
+                "mean": math.fsum(ordered) / len(ordered),
+                "p50": _percentile(ordered, 0.50),
+                "p95": _percentile(ordered, 0.95),
+                "p99": _percentile(ordered, 0.99),
+                "max": ordered[-1]}
+
+    def summaries(self, since=None):
+        """
+        Computes a summary for every name that has at least one sample.
+
+        :param since: The counts returned by "mark" before the durations to
+        summarize, or None to summarize every duration in the window.
+        :return: A dictionary of summaries associated by name.
+        """
+        since = since or dict()
+        summaries = dict()
+        for name in self.buffers:
+            summary = self.summary(name, since.get(name, 0))
+            if summary is not None:
+                summaries[name] = summary
+        return summaries
+
+    def report(self):
+        """
+        Creates a human readable table of the current summaries with all
+        durations given in milliseconds.
+
+        :return: A multi-line report.
+        """
+        lines = ["%-12s %8s %8s %8s %8s %8s" %
+                 ("name", "mean", "p50", "p95", "p99", "max")]
+        for name, summary in sorted(self.summaries().items()):
+            lines.append("%-12s %8.3f %8.3f %8.3f %8.3f %8.3f" %
+                         (name, summary["mean"] * 1000.0,
+                          summary["p50"] * 1000.0, summary["p95"] * 1000.0,
+                          summary["p99"] * 1000.0, summary["max"] * 1000.0))
+        return "\n".join(lines)
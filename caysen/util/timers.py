@@ -3,7 +3,9 @@ Contains timers that are each specialized for different use-cases, such as
 monitoring the elapsed system time for update purposes or waiting for a
 specific amount of wallclock time to pass before performing an action.
 """
+import statistics
 import time
+from collections import deque
 
 
 class SystemTimer:
@@ -52,6 +54,139 @@ class SystemTimer:
         self.delta_time = self.current_time - self.last_time
 
 
+class FrameLimiter:
+    """
+    Represents a mechanism for pacing a loop so that it runs no faster than
+    a target number of frames per second.
+
+    To avoid wasting CPU time while remaining accurate, this limiter uses a
+    hybrid approach to waiting: it sleeps for the majority of the remaining
+    frame time and then busy waits for the last small portion, since
+    operating system sleeps are rarely precise to better than a millisecond
+    or two.  When a frame overruns its deadline, the limiter re-synchronizes
+    rather than attempting to "catch up" with a burst of short frames.
+
+    Attributes:
+        deadline (float): The time at which the current frame should end.
+        fps (int): The target number of frames per second, or zero for no
+        limit.
+        idle (bool): Whether or not the limiter should use the idle frame
+        rate instead of the target one, e.g. when the window is not focused.
+        idle_fps (int): The target number of frames per second while idle.
+        last_time (float): The time at which the previous frame ended.
+        samples (deque): The most recent achieved frame times in seconds.
+        spin_time (float): The amount of time in seconds before a deadline
+        at which the limiter stops sleeping and begins busy waiting.
+    """
+
+    def __init__(self, fps=0, idle_fps=5, spin_time=0.002, window=120):
+        self.deadline = 0.0
+        self.fps = fps
+        self.idle = False
+        self.idle_fps = idle_fps
+        self.last_time = 0.0
+        self.samples = deque(maxlen=window)
+        self.spin_time = spin_time
+
+    @property
+    def frame_time(self):
+        """
+        Returns the mean achieved frame time in seconds over the most recent
+        frames.
+
+        :return: The mean frame time, or zero if there are no samples.
+        """
+        return statistics.fmean(self.samples) if self.samples else 0.0
+
+    @property
+    def jitter(self):
+        """
+        Returns the standard deviation of the achieved frame times in seconds
+        over the most recent frames.
+
+        :return: The frame time jitter, or zero if there are too few samples.
+        """
+        if len(self.samples) < 2:
+            return 0.0
+        return statistics.pstdev(self.samples)
+
+    def remaining(self):
+        """
+        Returns the amount of time left before the current frame's deadline.
+
+        :return: The remaining time in seconds, or zero if there is no target
+        frame rate or the deadline has passed.
+        """
+        fps = self.idle_fps if self.idle else self.fps
+        if fps <= 0:
+            return 0.0
+        return max(0.0, self.deadline + 1.0 / fps - time.perf_counter())
+
+    def start(self):
+        """
+        Begins pacing frames from the current time.
+        """
+        self.samples.clear()
+        self.deadline = self.last_time = time.perf_counter()
+
+    def wait(self):
+        """
+        Blocks until the current frame's deadline has been reached and then
+        records the achieved frame time.
+
+        If there is no target frame rate (and the limiter is not idle), then
+        this function returns immediately.
+        """
+        sleep_time = self._advance()
+        if sleep_time > 0:
+            time.sleep(sleep_time)
+        self._finish()
+
+    async def wait_async(self):
+        """
+        Waits until the current frame's deadline has been reached, as "wait"
+        does, but sleeps by suspending the calling coroutine so that other
+        tasks on the event loop may run in the meantime.
+
+        The event loop is given control at least once even if there is no
+        target frame rate.
+        """
+        # Only kernels executed by the asynchronous driver need asyncio, so
+        # it is not imported along with the kernel.
+        import asyncio
+
+        await asyncio.sleep(max(0.0, self._advance()))
+        self._finish()
+
+    def _advance(self):
+        """
+        Moves the deadline to the end of the current frame, re-synchronizing
+        it if the frame has already overrun.
+
+        :return: The amount of time in seconds to sleep before busy waiting.
+        """
+        fps = self.idle_fps if self.idle else self.fps
+        now = time.perf_counter()
+
+        if fps > 0:
+            self.deadline += 1.0 / fps
+        if fps <= 0 or self.deadline < now:
+            self.deadline = now
+        return self.deadline - now - self.spin_time
+
+    def _finish(self):
+        """
+        Busy waits for whatever remains until the deadline and then records
+        the achieved frame time.
+        """
+        while time.perf_counter() < self.deadline:
+            pass
+
+        now = time.perf_counter()
+        self.samples.append(now - self.last_time)
+        self.last_time = now
+
+
 class Stopwatch:
     """
     Represents a simple mechanism for waiting for a specific amount of time.
@@ -0,0 +1,177 @@
+"""
+Contains a mechanism for recording a timeline of events in the Trace Event
+Format so that it may be inspected with a trace viewer such as
+chrome://tracing or Perfetto.
+
+Game states and other code may add their own spans to the timeline by using
+the module-level "span" function, which does nothing unless a tracer has been
+made active:
+
+    with tracing.span("pathfinding"):
+        ...
+"""
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+_NULL_SPAN = nullcontext()
+
+_tracer = None
+
+
+def get_tracer():
+    """
+    Returns the currently active tracer.
+
+    :return: The active tracer, or None if tracing is disabled.
+    """
+    return _tracer
+
+
+def set_tracer(tracer):
+    """
+    Sets the currently active tracer that receives spans created with the
+    "span" function.
+
+    :param tracer: The tracer to use, or None to disable tracing.
+    """
+    global _tracer
+    _tracer = tracer
+
+
+def span(name, category="user"):
+    """
+    Creates a context manager that records the enclosed code as a span on
+    the active tracer, if any.
+
+    :param name: The name of the span.
+    :param category: The category of the span.
+    :return: A context manager.
+    """
+    if _tracer is None:
+        return _NULL_SPAN
+    return _tracer.span(name, category)
+
+
+class TraceWriter:
+    """
+    Represents a mechanism for recording begin and end events and writing
+    them to a file in the JSON array variant of the Trace Event Format.
+
+    Events are buffered in memory and handed off in batches to a background
+    thread that performs all serialization and file I/O, so recording an
+    event costs little more than appending a tuple to a list.
+
+    Attributes:
+        batch (list): The events that have yet to be handed off.
+        batch_size (int): The number of events to buffer before handing them
+        off to the background thread.
+        lock (threading.Lock): Guards the batch so that events may be
+        recorded from multiple threads.
+        path (str): The path of the trace file.
+        pid (int): The process identifier written with every event.
+        pending (queue.Queue): Batches of events that have yet to be written.
+        start_time (float): The time relative to which event timestamps are
+        measured.
+        thread (threading.Thread): The background writer thread.
+    """
+
+    def __init__(self, path, batch_size=4096):
+        self.batch = []
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.path = path
+        self.pid = os.getpid()
+        self.pending = queue.Queue()
+        self.start_time = time.perf_counter()
+        self.thread = threading.Thread(target=self._write, args=(path,),
+                                       name="tracing", daemon=True)
+        self.thread.start()
+
+    def begin(self, name, category="kernel"):
+        """
+        Records the beginning of a span with the specified name.
+
+        :param name: The name of the span.
+        :param category: The category of the span.
+        """
+        self._record(name, category, "B")
+
+    def close(self):
+        """
+        Writes all remaining events and closes the trace file.
+
+        This blocks until the background thread has finished.
+        """
+        with self.lock:
+            if self.batch:
+                self.pending.put(self.batch)
+                self.batch = []
+        self.pending.put(None)
+        self.thread.join()
+
+    def end(self, name, category="kernel"):
+        """
+        Records the end of a span with the specified name.
+
+        :param name: The name of the span.
+        :param category: The category of the span.
+        """
+        self._record(name, category, "E")
+
+    @contextmanager
+    def span(self, name, category="user"):
+        """
+        Records the enclosed code as a span with the specified name.
+
+        :param name: The name of the span.
+        :param category: The category of the span.
+        """
+        self.begin(name, category)
+        try:
+            yield
+        finally:
+            self.end(name, category)
+
+    def _record(self, name, category, phase):
+        """
+        Buffers a single event, handing the buffer off to the background
+        thread if it is full.
+
+        :param name: The name of the event.
+        :param category: The category of the event.
+        :param phase: The Trace Event Format phase, e.g. "B" or "E".
+        """
+        event = (name, category, phase, time.perf_counter() - self.start_time,
+                 threading.get_ident())
+        with self.lock:
+            self.batch.append(event)
+            if len(self.batch) >= self.batch_size:
+                self.pending.put(self.batch)
+                self.batch = []
+
+    def _write(self, path):
+        """
+        Serializes and writes batches of events until closed.
+
+        :param path: The path of the trace file.
+        """
+        separator = "\n"
+        with open(path, "w") as trace:
+            trace.write("[")
+            while True:
+                batch = self.pending.get()
+                if batch is None:
+                    break
+                for name, category, phase, timestamp, thread_id in batch:
+                    trace.write(separator)
+                    trace.write(json.dumps({"name": name, "cat": category,
+                                            "ph": phase,
+                                            "ts": timestamp * 1000000.0,
+                                            "pid": self.pid,
+                                            "tid": thread_id}))
+                    separator = ",\n"
+            trace.write("\n]\n")
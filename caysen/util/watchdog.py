@@ -0,0 +1,170 @@
+"""
+Contains a watchdog that monitors how much time subsystems spend in each
+frame and asks them to degrade gracefully when they are persistently over
+budget.
+"""
+import logging
+
+
+class Watchdog:
+    """
+    Represents a mechanism for comparing the time each subsystem spends per
+    frame against a budget and reacting to sustained overload.
+
+    Subsystems may register any number of degrade callbacks, each paired with
+    an optional restore callback, which act as successive levels of
+    degradation (e.g. first lowering the AI tick rate, then skipping
+    cosmetic rendering).  Once a subsystem has been over budget for enough
+    consecutive frames, the next level is applied.  Once it has stayed
+    comfortably within budget for enough consecutive frames, the most
+    recently applied level is reverted.
+
+    Attributes:
+        budgets (dict): The time in seconds each subsystem may spend per
+        frame associated by name.
+        degraders (dict): A list of degrade and restore callback pairs
+        associated by name.
+        headroom (float): The fraction of its budget a subsystem must stay
+        below for a frame to count towards recovery.
+        levels (dict): The number of degradation levels currently applied
+        associated by name.
+        overloads (dict): The number of consecutive frames spent over budget
+        associated by name.
+        patience (int): The number of consecutive frames a subsystem must be
+        over budget before it is degraded.
+        recoveries (dict): The number of consecutive frames spent with
+        headroom associated by name.
+        recovery (int): The number of consecutive frames a subsystem must
+        have headroom before a degradation is reverted.
+        spent (dict): The time in seconds spent during the current frame
+        associated by name.
+    """
+
+    def __init__(self, patience=30, recovery=120, headroom=0.75):
+        self.budgets = dict()
+        self.degraders = dict()
+        self.headroom = headroom
+        self.levels = dict()
+        self.overloads = dict()
+        self.patience = patience
+        self.recoveries = dict()
+        self.recovery = recovery
+        self.spent = dict()
+
+    def end_frame(self):
+        """
+        Compares the time each budgeted subsystem spent during the frame that
+        just ended against its budget, degrading or restoring it as needed,
+        and then begins a new frame.
+        """
+        for name, budget in self.budgets.items():
+            spent = self.spent[name]
+            self.spent[name] = 0.0
+
+            if spent > budget:
+                self.overloads[name] += 1
+                self.recoveries[name] = 0
+                if self.overloads[name] == 1:
+                    logging.warning("<i>%s</i> exceeded its frame budget: "
+                                    "%.3f ms of %.3f ms." %
+                                    (name, spent * 1000.0, budget * 1000.0))
+                if self.overloads[name] >= self.patience:
+                    self._degrade(name, spent, budget)
+                    self.overloads[name] = 0
+            elif spent <= budget * self.headroom:
+                self.overloads[name] = 0
+                self.recoveries[name] += 1
+                if self.recoveries[name] >= self.recovery:
+                    self._restore(name)
+                    self.recoveries[name] = 0
+            else:
+                self.overloads[name] = 0
+                self.recoveries[name] = 0
+
+    def record(self, name, duration):
+        """
+        Adds the specified duration to the time the subsystem with the
+        specified name has spent during the current frame.
+
+        :param name: The name of the subsystem.
+        :param duration: The duration in seconds.
+        """
+        if name in self.spent:
+            self.spent[name] += duration
+
+    def register(self, name, degrade, restore=None):
+        """
+        Registers an additional level of degradation for the subsystem with
+        the specified name.
+
+        :param name: The name of the subsystem.
+        :param degrade: The function to call, without arguments, to reduce
+        the subsystem's workload.
+        :param restore: The function to call, without arguments, to undo the
+        degradation, if any.
+        """
+        self.degraders.setdefault(name, []).append((degrade, restore))
+
+    def set_budget(self, name, budget):
+        """
+        Sets the time the subsystem with the specified name may spend per
+        frame.
+
+        :param name: The name of the subsystem.
+        :param budget: The budget in seconds, or None to stop monitoring it.
+        """
+        if budget is None:
+            for counters in (self.budgets, self.overloads, self.recoveries,
+                             self.spent):
+                counters.pop(name, None)
+            return
+
+        self.budgets[name] = budget
+        self.levels.setdefault(name, 0)
+        self.overloads[name] = 0
+        self.recoveries[name] = 0
+        self.spent[name] = 0.0
+
+    def _degrade(self, name, spent, budget):
+        """
+        Applies the next level of degradation to the subsystem with the
+        specified name, if there are any left.
+
+        :param name: The name of the subsystem.
+        :param spent: The time in seconds spent during the last frame.
+        :param budget: The subsystem's budget in seconds.
+        """
+        degraders = self.degraders.get(name, [])
+        level = self.levels[name]
+        if level >= len(degraders):
+            logging.warning("<i>%s</i> has been over its frame budget for %d "
+                            "frames (last %.3f ms of %.3f ms) and cannot be "
+                            "degraded any further." %
+                            (name, self.patience, spent * 1000.0,
+                             budget * 1000.0))
+            return
+
+        logging.warning("<i>%s</i> has been over its frame budget for %d "
+                        "frames (last %.3f ms of %.3f ms); degrading to "
+                        "level %d." % (name, self.patience, spent * 1000.0,
+                                       budget * 1000.0, level + 1))
+        degraders[level][0]()
+        self.levels[name] = level + 1
+
+    def _restore(self, name):
+        """
+        Reverts the most recently applied level of degradation of the
+        subsystem with the specified name, if any.
+
+        :param name: The name of the subsystem.
+        """
+        level = self.levels[name]
+        if level == 0:
+            return
+
+        logging.info("<i>%s</i> has recovered its frame budget; restoring to "
+                     "level %d." % (name, level - 1))
+        restore = self.degraders[name][level - 1][1]
+        if restore is not None:
+            restore()
+        self.levels[name] = level - 1
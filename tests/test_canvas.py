@@ -0,0 +1,74 @@
+import unittest
+
+import numpy as np
+
+from .context import caysen
+from caysen.subsystem.canvas import PlanarCanvas
+
+
+class TakeChangesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.canvas = PlanarCanvas("test", 10, 5)
+        self.canvas.take_changes()
+
+    def test_first_call_returns_whole_canvas(self):
+        canvas = PlanarCanvas("other", 10, 5)
+        self.assertEqual(canvas.take_changes(), [(0, 0, 10, 5)])
+
+    def test_no_changes(self):
+        self.assertEqual(self.canvas.take_changes(), [])
+
+    def test_unchanged_redraw(self):
+        self.canvas.write(0, 0, "  ")
+        self.canvas.mark()
+        self.assertEqual(self.canvas.take_changes(), [])
+
+    def test_changes_are_shrunk(self):
+        self.canvas.fill(2, 1, 3, 2, char="x")
+        self.canvas.fill(2, 1, 3, 1, char=" ")
+        self.assertEqual(self.canvas.take_changes(), [(2, 2, 3, 1)])
+        self.assertEqual(self.canvas.take_changes(), [])
+
+    def test_write(self):
+        self.canvas.write(8, 0, "ab")
+        self.assertEqual(self.canvas.take_changes(), [(8, 0, 2, 1)])
+
+    def test_write_negative_x(self):
+        self.canvas.write(-2, 1, "abc")
+        self.assertEqual(self.canvas.chars[1, 8:10].tolist(),
+                         [ord("a"), ord("b")])
+        self.assertEqual(self.canvas.chars[2, 0], ord("c"))
+        self.assertEqual(self.canvas.take_changes(), [(0, 1, 10, 2)])
+
+    def test_draw_negative_coordinates(self):
+        self.canvas.draw(-1, -1, "x")
+        self.assertEqual(self.canvas.chars[4, 9], ord("x"))
+        self.assertEqual(self.canvas.take_changes(), [(9, 4, 1, 1)])
+
+    def test_fill_negative_coordinates(self):
+        self.canvas.fill(-3, 0, char="x")
+        self.assertEqual(self.canvas.take_changes(), [(7, 0, 3, 5)])
+
+    def test_write_wraps(self):
+        self.canvas.write(8, 3, "abcd")
+        self.assertEqual(self.canvas.chars[4, :2].tolist(),
+                         [ord("c"), ord("d")])
+        self.assertEqual(self.canvas.take_changes(), [(0, 3, 10, 2)])
+
+    def test_write_clips_to_end(self):
+        self.canvas.write(8, 4, "abcd")
+        self.assertEqual(self.canvas.take_changes(), [(8, 4, 2, 1)])
+
+    def test_write_non_contiguous_planes(self):
+        chars = np.zeros((10, 5), dtype=np.intc).T
+        fg = np.zeros((10, 5, 3), dtype=np.uint8).transpose(1, 0, 2)
+        canvas = PlanarCanvas("view", 10, 5, (chars, fg, fg.copy()))
+        canvas.write(8, 0, "abc", fg=(1, 2, 3))
+        self.assertEqual(chars[0, 8:10].tolist(), [ord("a"), ord("b")])
+        self.assertEqual(chars[1, 0], ord("c"))
+        self.assertEqual(fg[1, 0].tolist(), [1, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
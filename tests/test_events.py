@@ -0,0 +1,85 @@
+import unittest
+
+from .context import caysen
+from caysen.util.events import EventBus
+
+
+class EventBusTest(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = EventBus()
+        self.channel = self.bus.channel("moves", ("entity", "x", "y"),
+                                        capacity=2)
+        self.deliveries = []
+
+    def _subscribe(self, subscriber):
+        def deliver(channel):
+            self.deliveries.append(
+                (subscriber, list(zip(*[column[:channel.count]
+                                        for column in channel.columns]))))
+        self.bus.subscribe("moves", subscriber, deliver)
+        return deliver
+
+    def test_delivered_at_dispatch(self):
+        self._subscribe("ai")
+        self.channel.publish(1, 2, 3)
+        self.assertEqual(self.deliveries, [])
+        self.bus.dispatch()
+        self.assertEqual(self.deliveries, [("ai", [(1, 2, 3)])])
+
+    def test_delivered_in_subscriber_order(self):
+        self._subscribe("display")
+        self._subscribe("unordered")
+        self._subscribe("ai")
+        self.bus.set_order(["ai", "game", "display"])
+        self.channel.publish(1, 2, 3)
+        self.bus.dispatch()
+        self.assertEqual([subscriber for subscriber, _ in self.deliveries],
+                         ["ai", "display", "unordered"])
+
+    def test_grows_past_capacity(self):
+        self._subscribe("ai")
+        for index in range(5):
+            self.channel.publish(index, index, index)
+        self.bus.dispatch()
+        self.assertEqual(self.deliveries[0][1],
+                         [(index, index, index) for index in range(5)])
+        self.assertEqual(self.channel.field("x")[:self.channel.count],
+                         list(range(5)))
+
+    def test_published_during_delivery_waits_for_next_dispatch(self):
+        def republish(channel):
+            if channel.field("entity")[0] == 1:
+                self.channel.publish(2, 0, 0)
+        self.bus.subscribe("moves", "ai", republish)
+        self._subscribe("display")
+
+        self.channel.publish(1, 0, 0)
+        self.bus.dispatch()
+        self.assertEqual(self.deliveries, [("display", [(1, 0, 0)])])
+        self.bus.dispatch()
+        self.assertEqual(self.deliveries[1], ("display", [(2, 0, 0)]))
+
+    def test_empty_frames_are_not_delivered(self):
+        self._subscribe("ai")
+        self.bus.dispatch()
+        self.assertEqual(self.deliveries, [])
+
+    def test_unsubscribe(self):
+        deliver = self._subscribe("ai")
+        self.bus.unsubscribe("moves", deliver)
+        self.channel.publish(1, 2, 3)
+        self.bus.dispatch()
+        self.assertEqual(self.deliveries, [])
+
+    def test_mismatched_fields(self):
+        with self.assertRaises(ValueError):
+            self.bus.channel("moves", ("entity",))
+        with self.assertRaises(ValueError):
+            self.channel.publish(1, 2)
+        with self.assertRaises(KeyError):
+            self.bus.channel("missing")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import threading
+import unittest
+
+from .context import caysen
+from caysen.util.jobs import JobError, JobSystem
+
+
+class JobSystemTest(unittest.TestCase):
+
+    def setUp(self):
+        self.jobs = JobSystem(3)
+
+    def tearDown(self):
+        self.jobs.shutdown()
+
+    def test_dependencies_run_first(self):
+        order = []
+        lock = threading.Lock()
+
+        def record(name):
+            with lock:
+                order.append(name)
+
+        first = self.jobs.submit(record, "first")
+        second = self.jobs.submit(record, "second", after=[first])
+        self.jobs.submit(record, "third", after=[first, second])
+        self.jobs.join()
+        self.assertEqual(order, ["first", "second", "third"])
+
+    def test_wait_returns_result(self):
+        job = self.jobs.submit(sum, [1, 2, 3])
+        self.assertEqual(self.jobs.wait(job), 6)
+
+    def test_parallel_for_covers_range(self):
+        seen = [0] * 1000
+
+        def visit(start, stop):
+            for index in range(start, stop):
+                seen[index] += 1
+
+        done = self.jobs.parallel_for(len(seen), visit, grain=7)
+        self.jobs.wait(done)
+        self.assertEqual(seen, [1] * len(seen))
+
+    def test_join_waits_for_every_job(self):
+        counter = [0]
+        lock = threading.Lock()
+
+        def spawn(depth):
+            with lock:
+                counter[0] += 1
+            if depth:
+                self.jobs.submit(spawn, depth - 1)
+                self.jobs.submit(spawn, depth - 1)
+
+        self.jobs.submit(spawn, 5)
+        self.jobs.join()
+        self.assertEqual(counter[0], 63)
+        self.assertEqual(self.jobs.outstanding, 0)
+
+    def test_error_skips_dependants(self):
+        ran = []
+
+        def fail():
+            raise RuntimeError("boom")
+
+        failed = self.jobs.submit(fail)
+        dependant = self.jobs.submit(ran.append, "dependant", after=[failed])
+        with self.assertRaises(JobError) as context:
+            self.jobs.join()
+        self.assertIsInstance(context.exception.__cause__, RuntimeError)
+        self.assertEqual(ran, [])
+        self.assertIs(dependant.error, failed.error)
+
+        with self.assertRaises(RuntimeError):
+            self.jobs.wait(dependant)
+
+    def test_errors_are_cleared_by_join(self):
+        self.jobs.submit(int, "not a number")
+        with self.assertRaises(JobError):
+            self.jobs.join()
+        self.jobs.submit(int, "1")
+        self.jobs.join()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import unittest
+
+from .context import caysen
+from caysen.kernel import DependencyError, Kernel, SubSystem
+
+
+class StubSubSystem(SubSystem):
+    """
+    Represents a subsystem that does nothing but count its updates.
+
+    Attributes:
+        dependencies (list): The names of the subsystems this one depends on
+        in every state.
+        updates (int): The number of times this subsystem was updated.
+    """
+
+    def __init__(self, name, dependencies=(), fixed_step=True):
+        super().__init__(name)
+        self.dependencies = list(dependencies)
+        self.fixed_step = fixed_step
+        self.updates = 0
+
+    def get_dependencies(self):
+        return {"init": self.dependencies, "update": self.dependencies,
+                "shutdown": self.dependencies}
+
+    def initialize(self, params, kernel):
+        pass
+
+    def shutdown(self):
+        pass
+
+    def update(self, delta_time):
+        self.updates += 1
+
+
+def _get_names(tiers):
+    """
+    Converts the specified execution tiers into lists of subsystem names.
+
+    :param tiers: A list of tiers, each of which is a list of subsystems.
+    :return: A list of sorted lists of names.
+    """
+    return [sorted(subsystem.name for subsystem in tier) for tier in tiers]
+
+
+class ResolverTest(unittest.TestCase):
+
+    def setUp(self):
+        self.kernel = Kernel()
+        self.kernel.add(StubSubSystem("a"))
+        self.kernel.add(StubSubSystem("b", ["a"]))
+        self.kernel.add(StubSubSystem("c", ["a"]))
+        self.kernel.add(StubSubSystem("d", ["b", "c"]))
+
+    def test_tiers(self):
+        self.assertEqual(_get_names(self.kernel.get_plan("update")),
+                         [["a"], ["b", "c"], ["d"]])
+
+    def test_missing_dependencies_are_satisfied(self):
+        self.kernel.add(StubSubSystem("e", ["missing"]))
+        self.assertEqual(_get_names(self.kernel.get_plan("init")),
+                         [["a", "e"], ["b", "c"], ["d"]])
+
+    def test_cycle(self):
+        self.kernel.add(StubSubSystem("a", ["d"]))
+        with self.assertRaises(DependencyError):
+            self.kernel.get_plan("update")
+
+    def test_plan_is_cached(self):
+        self.assertIs(self.kernel.get_plan("update"),
+                      self.kernel.get_plan("update"))
+
+    def test_add_invalidates_plan(self):
+        self.kernel.get_plan("update")
+        self.kernel.add(StubSubSystem("e", ["d"]))
+        self.assertEqual(_get_names(self.kernel.get_plan("update")),
+                         [["a"], ["b", "c"], ["d"], ["e"]])
+
+    def test_remove_invalidates_plan(self):
+        self.kernel.get_plan("update")
+        self.kernel.remove("d")
+        self.assertEqual(_get_names(self.kernel.get_plan("update")),
+                         [["a"], ["b", "c"]])
+
+
+class StepTest(unittest.TestCase):
+
+    def setUp(self):
+        self.kernel = Kernel()
+        self.subsystem = StubSubSystem("stub")
+        self.kernel.add(self.subsystem)
+        self.kernel.initialize({"kernel.tickRate": 10})
+
+    def tearDown(self):
+        self.kernel.shutdown()
+
+    def test_step_carries_accumulator_over(self):
+        ticks = [self.kernel.step(1, 0.05)["ticks"] for _ in range(4)]
+        self.assertEqual(ticks, [0, 1, 0, 1])
+        self.assertEqual(self.subsystem.updates, 2)
+
+    def test_step_once_matches_step_many(self):
+        other = Kernel()
+        other.add(StubSubSystem("stub"))
+        other.initialize({"kernel.tickRate": 10})
+        try:
+            many = other.step(6, 0.05)["ticks"]
+        finally:
+            other.shutdown()
+        once = sum(self.kernel.step(1, 0.05)["ticks"] for _ in range(6))
+        self.assertEqual(once, many)
+
+    def test_run_for(self):
+        for _ in range(3):
+            stats = self.kernel.run_for(1.0)
+            self.assertEqual(stats["frames"], 10)
+            self.assertEqual(stats["ticks"], 10)
+        self.assertEqual(self.subsystem.updates, 30)
+        self.assertEqual(self.kernel.ticks, 30)
+
+    def test_run_for_ignores_rounding_error(self):
+        self.assertEqual(self.kernel.run_for(8.3, 1.0 / 30)["frames"], 249)
+
+    def test_step_summarizes_only_its_updates(self):
+        self.kernel.step(20, 0.1)
+        stats = self.kernel.step(5, 0.1)
+        self.assertEqual(stats["subsystems"]["stub"]["count"], 5)
+
+    def test_idle_frames_keep_pace(self):
+        other = Kernel()
+        other.add(StubSubSystem("stub"))
+        other.initialize({"kernel.tickRate": 60, "kernel.idleFps": 5})
+        other.limiter.idle = True
+        try:
+            self.assertEqual(other.step(1, 0.2)["ticks"], 12)
+        finally:
+            other.shutdown()
+
+    def test_reset_starts_new_run(self):
+        self.kernel.step(1, 0.05)
+        self.kernel.reset()
+        self.assertEqual(self.kernel.step(1, 0.05)["ticks"], 0)
+        self.assertEqual(self.kernel.ticks, 0)
+
+
+class ScheduleTest(unittest.TestCase):
+
+    def setUp(self):
+        self.kernel = Kernel()
+        self.subsystem = StubSubSystem("stub", fixed_step=False)
+        self.kernel.add(self.subsystem)
+        self.kernel.initialize({})
+
+    def tearDown(self):
+        self.kernel.shutdown()
+
+    def test_update_rate_changes_while_running(self):
+        self.kernel.step(4, 0.1)
+        self.assertEqual(self.subsystem.updates, 4)
+
+        self.subsystem.update_rate = 4
+        self.kernel.step(4, 0.1)
+        self.assertEqual(self.subsystem.updates, 5)
+
+        self.subsystem.update_rate = 0
+        self.kernel.step(2, 0.1)
+        self.assertEqual(self.subsystem.updates, 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
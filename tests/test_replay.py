@@ -0,0 +1,114 @@
+import os
+import random
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from .context import caysen
+from caysen.kernel import Kernel, SubSystem
+from caysen.util.replay import SessionRecorder, SessionReplay
+
+
+class RandomSubSystem(SubSystem):
+    """
+    Represents a subsystem that draws a random number on every update.
+
+    Attributes:
+        history (list): The delta time and random number of every update.
+    """
+
+    def __init__(self):
+        super().__init__("random")
+        self.fixed_step = False
+        self.history = []
+
+    def get_dependencies(self):
+        return {"init": [], "update": [], "shutdown": []}
+
+    def initialize(self, params, kernel):
+        pass
+
+    def shutdown(self):
+        pass
+
+    def update(self, delta_time):
+        self.history.append((delta_time, random.random()))
+
+
+class SessionReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        descriptor, self.path = tempfile.mkstemp(suffix=".replay")
+        os.close(descriptor)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_round_trip(self):
+        recorder = SessionRecorder(self.path, 1234)
+        recorder.write_frame(0.016)
+        recorder.write_events([
+            SimpleNamespace(type="KEYDOWN", key="CHAR", char="a",
+                            shift=True, ignored=object()),
+            SimpleNamespace(type="MOUSEMOTION", pos=(3, 4), cell=(1, 2))])
+        recorder.write_frame(0.017)
+        recorder.write_frame(0.018)
+        recorder.write_events([SimpleNamespace(type="QUIT")])
+        recorder.close()
+
+        replay = SessionReplay(self.path)
+        self.assertEqual(replay.seed, 1234)
+
+        self.assertEqual(replay.read_frame(), 0.016)
+        key, motion = replay.read_events()
+        self.assertEqual((key.type, key.key, key.char, key.shift),
+                         ("KEYDOWN", "CHAR", "a", True))
+        self.assertFalse(hasattr(key, "ignored"))
+        self.assertEqual((motion.type, motion.pos, motion.cell),
+                         ("MOUSEMOTION", (3, 4), (1, 2)))
+        self.assertEqual(replay.read_events(), [])
+
+        self.assertEqual(replay.read_frame(), 0.017)
+        self.assertEqual(replay.read_events(), [])
+
+        self.assertEqual(replay.read_frame(), 0.018)
+        self.assertEqual([event.type for event in replay.read_events()],
+                         ["QUIT"])
+        self.assertIsNone(replay.read_frame())
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as file:
+            file.write(b"not a session log")
+        with self.assertRaises(ValueError):
+            SessionReplay(self.path)
+
+    def test_kernel_session(self):
+        recorded = RandomSubSystem()
+        kernel = Kernel()
+        kernel.add(recorded)
+        kernel.initialize({"kernel.record": self.path})
+        try:
+            kernel.step(5)
+        finally:
+            kernel.shutdown()
+
+        replayed = RandomSubSystem()
+        kernel = Kernel()
+        kernel.add(replayed)
+        kernel.initialize({"kernel.replay": self.path})
+        try:
+            self.assertEqual(kernel.step(10)["frames"], 5)
+        finally:
+            kernel.shutdown()
+        self.assertEqual(replayed.history, recorded.history)
+
+    def test_parallel_kernel_is_refused(self):
+        kernel = Kernel()
+        kernel.add(RandomSubSystem())
+        with self.assertRaises(ValueError):
+            kernel.initialize({"kernel.record": self.path,
+                               "kernel.parallel": True})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import threading
+import unittest
+
+from .context import caysen
+from caysen.util.ring import SharedRingBuffer
+
+
+class SharedRingBufferTest(unittest.TestCase):
+
+    def setUp(self):
+        self.buffer = SharedRingBuffer(threading.Semaphore(0), 64)
+
+    def tearDown(self):
+        self.buffer.close()
+
+    def test_round_trip(self):
+        self.buffer.write(b"hello")
+        self.buffer.write(b"")
+        self.assertEqual(self.buffer.read(0), b"hello")
+        self.assertEqual(self.buffer.read(0), b"")
+        self.assertIsNone(self.buffer.read(0))
+
+    def test_wraps_around(self):
+        # Each message takes 24 bytes, so they straddle the end of the buffer
+        # at different offsets on successive passes.
+        for index in range(20):
+            message = bytes([index]) * 20
+            self.buffer.write(message)
+            self.assertEqual(self.buffer.read(0), message)
+
+    def test_wraps_around_while_full(self):
+        messages = [bytes([index]) * 26 for index in range(10)]
+        self.buffer.write(messages[0])
+        self.buffer.write(messages[1])
+        for index in range(2, len(messages)):
+            self.assertEqual(self.buffer.read(0), messages[index - 2])
+            self.buffer.write(messages[index])
+        self.assertEqual(self.buffer.read(0), messages[-2])
+        self.assertEqual(self.buffer.read(0), messages[-1])
+
+    def test_full_write_times_out(self):
+        self.buffer.write(bytes(40))
+        with self.assertRaises(TimeoutError):
+            self.buffer.write(bytes(40), 0.01)
+
+    def test_message_too_large(self):
+        with self.assertRaises(ValueError):
+            self.buffer.write(bytes(61))
+
+    def test_producer_and_consumer_threads(self):
+        messages = [str(index).encode() * (index % 13) for index in range(500)]
+
+        def produce():
+            for message in messages:
+                self.buffer.write(message, 5.0)
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+        received = [self.buffer.read(5.0) for _ in messages]
+        producer.join()
+        self.assertEqual(received, messages)
+
+
+if __name__ == '__main__':
+    unittest.main()
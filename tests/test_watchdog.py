@@ -0,0 +1,60 @@
+import unittest
+
+from .context import caysen
+from caysen.util.watchdog import Watchdog
+
+
+class WatchdogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.watchdog = Watchdog(patience=3, recovery=2, headroom=0.5)
+        self.watchdog.set_budget("ai", 0.010)
+        self.calls = []
+        self.watchdog.register("ai", lambda: self.calls.append("degrade 1"),
+                               lambda: self.calls.append("restore 1"))
+        self.watchdog.register("ai", lambda: self.calls.append("degrade 2"))
+
+    def _run(self, frames, duration):
+        for _ in range(frames):
+            self.watchdog.record("ai", duration)
+            self.watchdog.end_frame()
+
+    def test_degrades_after_patience(self):
+        self._run(2, 0.020)
+        self.assertEqual(self.calls, [])
+        self._run(1, 0.020)
+        self.assertEqual(self.calls, ["degrade 1"])
+        self.assertEqual(self.watchdog.levels["ai"], 1)
+
+    def test_degrades_level_by_level(self):
+        self._run(9, 0.020)
+        self.assertEqual(self.calls, ["degrade 1", "degrade 2"])
+        self.assertEqual(self.watchdog.levels["ai"], 2)
+
+    def test_intermittent_overload_does_not_degrade(self):
+        for _ in range(5):
+            self._run(2, 0.020)
+            self._run(1, 0.008)
+        self.assertEqual(self.calls, [])
+
+    def test_restores_most_recent_level(self):
+        self._run(6, 0.020)
+        self._run(2, 0.001)
+        self.assertEqual(self.watchdog.levels["ai"], 1)
+        self._run(2, 0.001)
+        self.assertEqual(self.calls, ["degrade 1", "degrade 2", "restore 1"])
+        self.assertEqual(self.watchdog.levels["ai"], 0)
+
+    def test_frames_without_headroom_do_not_restore(self):
+        self._run(3, 0.020)
+        self._run(10, 0.008)
+        self.assertEqual(self.watchdog.levels["ai"], 1)
+
+    def test_removed_budget_is_not_monitored(self):
+        self.watchdog.set_budget("ai", None)
+        self._run(10, 0.020)
+        self.assertEqual(self.calls, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+from .context import caysen
+from caysen.game.world import World
+
+
+class WorldTest(unittest.TestCase):
+
+    def test_swap_publishes_back_buffer(self):
+        world = World()
+        world.add("x", (3,), int)[:] = 1
+        world.swap()
+        self.assertEqual(world.front["x"].tolist(), [1, 1, 1])
+        self.assertEqual(world.back["x"].tolist(), [1, 1, 1])
+        self.assertEqual(world.front.tick, 1)
+        with self.assertRaises(ValueError):
+            world.front["x"][0] = 2
+
+    def test_deferred_snapshot_survives_several_ticks(self):
+        world = World(defer=True)
+        world.add("x", (3,), int)[:] = 1
+        world.swap()
+        snapshot = world.front
+        for value in range(2, 6):
+            world.back["x"][:] = value
+            world.swap()
+        self.assertEqual(snapshot["x"].tolist(), [1, 1, 1])
+        self.assertEqual(world.front["x"].tolist(), [5, 5, 5])
+
+    def test_release_allows_reuse(self):
+        world = World(defer=True)
+        world.add("x", (3,), int)
+        world.swap()
+        world.swap()
+        retired = list(world.retired)
+        world.release()
+        world.swap()
+        self.assertIn(world.back, retired)
+
+
+if __name__ == '__main__':
+    unittest.main()